@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import resource
+import subprocess
+import contextlib
+import urllib.request
+
+from fake_sheets_server import FakeSheetsServer
+
+# Constants
+DEFAULT_SIZES = '1000,10000'
+DEFAULT_MODES = 'full,stream,incremental-idle'
+MODES = ['full', 'stream', 'columnar', 'incremental-idle']
+BENCH_READ_QUOTA = 1000000  # Effectively unthrottled against the local server
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def server_requests(endpoint):
+    """Read the fake server's API request counter."""
+    with urllib.request.urlopen(f"{endpoint}/_stats") as response:
+        return json.load(response)['total']
+
+def run_one(mode, chunk_size):
+    """Run one fetch -> dedup -> markdown pass in this process and print a JSON result.
+
+    Expects SHEETS_API_ENDPOINT to point at a fake server and the current
+    directory to be an empty scratch directory.
+    """
+    import fetch_new_entries as fetch
+    from sheets_client import configure_read_quota
+
+    configure_read_quota(BENCH_READ_QUOTA, burst=BENCH_READ_QUOTA)
+    endpoint = os.environ['SHEETS_API_ENDPOINT']
+    args = argparse.Namespace(
+        force_all=False, incremental=False, stream=False, columnar=False, parquet=None,
+        chunk_size=chunk_size, id_columns=fetch.ID_COLUMNS)
+    if mode == 'stream':
+        args.stream = True
+    elif mode == 'columnar':
+        args.columnar = True
+
+    with fetch.open_store(fetch.DEFAULT_SOURCE) as processed_entries, \
+            open(os.devnull, 'w') as devnull:
+        if mode == 'incremental-idle':
+            # Measure a poll that finds nothing new after an initial full run
+            with contextlib.redirect_stdout(devnull):
+                fetch.process_new_entries(processed_entries, args)
+            args.incremental = True
+
+        requests_before = server_requests(endpoint)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(devnull):
+            new_entries = fetch.process_new_entries(processed_entries, args)
+        elapsed = time.perf_counter() - start
+        api_calls = server_requests(endpoint) - requests_before
+
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_rss_mb = peak_rss / (1024 * 1024) if sys.platform == 'darwin' else peak_rss / 1024
+    print(json.dumps({
+        'seconds': elapsed,
+        'new_entries': new_entries,
+        'api_calls': api_calls,
+        'peak_rss_mb': peak_rss_mb
+    }))
+
+def run_case(server, mode, rows, chunk_size):
+    """Run one benchmark case in a fresh subprocess so peak RSS is per case."""
+    server.sheet.rows = rows
+    scratch = tempfile.mkdtemp(prefix='bench_ingest_')
+    env = dict(os.environ, SHEETS_API_ENDPOINT=server.endpoint,
+               PYTHONPATH=os.pathsep.join(filter(None, [SCRIPT_DIR, os.environ.get('PYTHONPATH')])))
+    try:
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--run-one', mode, '--chunk-size', str(chunk_size)],
+            cwd=scratch, env=env, capture_output=True, text=True, check=True).stdout
+    except subprocess.CalledProcessError as e:
+        print(f"Case {mode}/{rows} failed:\n{e.stderr}")
+        raise
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    result = json.loads(output.strip().splitlines()[-1])
+    result.update({'mode': mode, 'rows': rows})
+    result['rows_per_second'] = rows / result['seconds'] if result['seconds'] else 0.0
+    return result
+
+def print_results(results):
+    print(f"\n{'mode':<18}{'rows':>10}{'seconds':>10}{'rows/s':>12}{'api calls':>11}{'peak RSS MB':>13}")
+    for r in results:
+        print(f"{r['mode']:<18}{r['rows']:>10}{r['seconds']:>10.2f}{r['rows_per_second']:>12.0f}"
+              f"{r['api_calls']:>11}{r['peak_rss_mb']:>13.1f}")
+
+def compare_to_baseline(results, baseline_path, tolerance):
+    """Return the cases that got slower (or used more RSS) than the baseline allows."""
+    with open(baseline_path, 'r') as f:
+        baseline = {(r['mode'], r['rows']): r for r in json.load(f)}
+
+    regressions = []
+    for r in results:
+        base = baseline.get((r['mode'], r['rows']))
+        if not base:
+            continue
+        if r['rows_per_second'] < base['rows_per_second'] * (1 - tolerance):
+            regressions.append(f"{r['mode']}/{r['rows']}: {r['rows_per_second']:.0f} rows/s "
+                               f"vs baseline {base['rows_per_second']:.0f}")
+        if r['peak_rss_mb'] > base['peak_rss_mb'] * (1 + tolerance):
+            regressions.append(f"{r['mode']}/{r['rows']}: {r['peak_rss_mb']:.1f} MB peak RSS "
+                               f"vs baseline {base['peak_rss_mb']:.1f}")
+        if r['api_calls'] > base['api_calls']:
+            regressions.append(f"{r['mode']}/{r['rows']}: {r['api_calls']} API calls "
+                               f"vs baseline {base['api_calls']}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the fetch -> dedup -> markdown pipeline against a local fake Sheets API')
+    parser.add_argument('--rows', type=str, default=DEFAULT_SIZES,
+                        help=f'Comma-separated sheet sizes to test (default: {DEFAULT_SIZES})')
+    parser.add_argument('--modes', type=str, default=DEFAULT_MODES,
+                        help=f'Comma-separated modes from {",".join(MODES)} (default: {DEFAULT_MODES})')
+    parser.add_argument('--chunk-size', type=int, default=5000, help='Rows per request for stream mode')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds of delay per API request')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of API requests that fail with 429/503')
+    parser.add_argument('--output', type=str, help='Write results to this JSON file')
+    parser.add_argument('--baseline', type=str, help='Compare against a previous --output file')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Allowed slowdown / RSS growth vs the baseline as a fraction (default: 0.2)')
+    parser.add_argument('--run-one', type=str, choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        run_one(args.run_one, args.chunk_size)
+        return
+
+    modes = [m.strip() for m in args.modes.split(',') if m.strip()]
+    for mode in modes:
+        if mode not in MODES:
+            parser.error(f"Unknown mode {mode}; choose from {', '.join(MODES)}")
+    sizes = [int(size) for size in args.rows.split(',') if size.strip()]
+
+    server = FakeSheetsServer(0, port=0, latency=args.latency, error_rate=args.error_rate).start()
+    print(f"Fake Sheets API running at {server.endpoint}")
+
+    results = []
+    try:
+        for rows in sizes:
+            for mode in modes:
+                print(f"Running {mode} with {rows} rows...")
+                results.append(run_case(server, mode, rows, args.chunk_size))
+    finally:
+        server.shutdown()
+
+    print_results(results)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved results to {args.output}")
+
+    if args.baseline:
+        regressions = compare_to_baseline(results, args.baseline, args.tolerance)
+        if regressions:
+            print("\nRegressions against baseline:")
+            for regression in regressions:
+                print(f"- {regression}")
+            sys.exit(1)
+        print("\nNo regressions against baseline.")
+
+if __name__ == "__main__":
+    main()
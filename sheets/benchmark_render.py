@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+import json
+import os
+import time
+import random
+import argparse
+import markdown
+
+from email_templates import EmailRenderer, CompiledTemplate, TEMPLATE_DIR, DEFAULT_TEMPLATE
+
+# Constants
+DEFAULT_MESSAGES = 10000
+DEFAULT_UNIQUE = 200
+SEED = 7
+PHRASES = [
+    'Thanks for trying **AI crush**!',
+    'We loved your idea about *voice notes*.',
+    'Here is the link we mentioned: <https://trelis.com>',
+    '- Faster replies\n- Better matching\n- More events',
+    'Let us know if you would like to join the beta.',
+    '> You said it was fun, and we agree.'
+]
+
+def synthetic_comments(count, unique, seed=SEED):
+    """Return `count` markdown comment bodies drawn from `unique` distinct ones."""
+    rng = random.Random(seed)
+    bodies = ['\n\n'.join(rng.sample(PHRASES, rng.randint(1, 4))) + f'\n\nReviewer note #{i}'
+              for i in range(unique)]
+    return [bodies[rng.randrange(unique)] for _ in range(count)]
+
+def render_naive(comments_list, template_source):
+    """The pre-template path: a fresh markdown.markdown() call and full template substitution per message."""
+    for comments in comments_list:
+        comments_html = markdown.markdown(comments)
+        CompiledTemplate(template_source).render({'comments_html': comments_html, 'comments_text': comments})
+
+def render_compiled(comments_list, cache_size):
+    renderer = EmailRenderer(TEMPLATE_DIR, DEFAULT_TEMPLATE, cache_size=cache_size)
+    for comments in comments_list:
+        renderer.render(comments)
+
+def time_case(name, func, count):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    return {'case': name, 'messages': count, 'seconds': elapsed,
+            'messages_per_second': count / elapsed if elapsed else 0.0}
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark email body rendering throughput')
+    parser.add_argument('--messages', type=int, default=DEFAULT_MESSAGES,
+                        help=f'Messages to render per case (default: {DEFAULT_MESSAGES})')
+    parser.add_argument('--unique', type=int, default=DEFAULT_UNIQUE,
+                        help=f'Distinct comment bodies among them (default: {DEFAULT_UNIQUE})')
+    parser.add_argument('--output', type=str, help='Write results to this JSON file')
+    args = parser.parse_args()
+
+    comments_list = synthetic_comments(args.messages, max(1, args.unique))
+    with open(os.path.join(TEMPLATE_DIR, f'{DEFAULT_TEMPLATE}.html'), 'r') as f:
+        template_source = f.read()
+
+    results = [
+        time_case('naive', lambda: render_naive(comments_list, template_source), args.messages),
+        time_case('compiled', lambda: render_compiled(comments_list, cache_size=0), args.messages),
+        time_case('compiled+cache', lambda: render_compiled(comments_list, cache_size=None), args.messages)
+    ]
+
+    print(f"\n{'case':<18}{'messages':>10}{'seconds':>10}{'msg/s':>12}")
+    for r in results:
+        print(f"{r['case']:<18}{r['messages']:>10}{r['seconds']:>10.2f}{r['messages_per_second']:>12.0f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved results to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+import hashlib
+from datetime import datetime
+
+# Constants
+POLICIES = ['merge', 'latest', 'separate']
+DEFAULT_POLICY = 'merge'
+MERGE_SEPARATOR = '\n\n---\n\n'
+GMAIL_DOMAINS = {'gmail.com', 'googlemail.com'}
+# Google Forms writes timestamps like 3/25/2025 15:14:39
+TIMESTAMP_FORMATS = ['%m/%d/%Y %H:%M:%S', '%d/%m/%Y %H:%M:%S', '%Y-%m-%d %H:%M:%S']
+
+def normalize_address(address):
+    """Canonical form of an email address for grouping (the address sent to is unchanged).
+
+    Lower-cases the address. For Gmail it also drops dots and `+tags` from
+    the local part, since Gmail delivers those variants to one mailbox.
+    """
+    local, _, domain = address.strip().lower().rpartition('@')
+    if not local:
+        return address.strip().lower()
+    if domain in GMAIL_DOMAINS:
+        local = local.split('+', 1)[0].replace('.', '')
+        domain = 'gmail.com'
+    return f'{local}@{domain}'
+
+def parse_form_timestamp(value):
+    """Parse a form timestamp, or return None if it is missing or in an unknown format."""
+    for fmt in TIMESTAMP_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except (TypeError, ValueError):
+            continue
+    return None
+
+def group_key(entry_ids):
+    """Outbox key for a group of entries: the entry ID itself for a single entry."""
+    if len(entry_ids) == 1:
+        return entry_ids[0]
+    digest = hashlib.blake2b(','.join(sorted(entry_ids)).encode('utf-8'), digest_size=16).hexdigest()
+    return f'group-{digest}'
+
+class ReviewGroup:
+    """Ready reviews for one normalized recipient address."""
+
+    def __init__(self, address):
+        self.address = address
+        self.members = []  # (file_path, parsed_data, bodies)
+
+    def add(self, file_path, parsed_data, bodies):
+        self.members.append((file_path, parsed_data, bodies))
+
+    @property
+    def file_paths(self):
+        return [file_path for file_path, _, _ in self.members]
+
+    def by_time(self):
+        """Members oldest first; reviews without a readable timestamp sort first, by file."""
+        return sorted(self.members, key=lambda m: (parse_form_timestamp(m[1].get('timestamp')) or datetime.min, m[0]))
+
+def group_reviews(reviews):
+    """Group (file_path, parsed_data, bodies) tuples by normalized recipient, keeping first-seen order."""
+    groups = {}
+    for file_path, parsed_data, bodies in reviews:
+        address = normalize_address(parsed_data['email'])
+        group = groups.get(address)
+        if group is None:
+            group = groups[address] = ReviewGroup(address)
+        group.add(file_path, parsed_data, bodies)
+    return list(groups.values())
+
+def coalesce(groups, policy, renderer):
+    """Turn review groups into emails according to `policy`.
+
+    - `merge`: one email per recipient with every review's comments, oldest first
+    - `latest`: one email per recipient with only the newest review's comments
+    - `separate`: one email per review (no coalescing)
+
+    Returns a list of (file_paths, recipient, text, html). The recipient
+    is the address as written in the newest review.
+    """
+    emails = []
+    for group in groups:
+        if policy == 'separate':
+            for file_path, parsed_data, (text, html) in group.members:
+                emails.append(([file_path], parsed_data['email'], text, html))
+            continue
+
+        members = group.by_time()
+        newest = members[-1]
+        recipient = newest[1]['email']
+        if policy == 'latest' or len(members) == 1:
+            text, html = newest[2]
+        else:
+            comments = MERGE_SEPARATOR.join(m[1]['comments'] for m in members if m[1]['comments'])
+            text, html = renderer.render(comments)
+        emails.append((group.file_paths, recipient, text, html))
+    return emails
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+import re
+import json
+import hashlib
+import pandas as pd
+
+def values_to_frame(values):
+    """Turn a values.get payload (header row first) into a DataFrame.
+
+    The Sheets API drops trailing empty cells, so rows can be shorter than
+    the header. The DataFrame constructor pads them in one pass; cells past
+    the last header are dropped and missing cells become "" to match the
+    dictionary path. A header that appears twice keeps its first position
+    and the value of its last column, as rows_to_dicts() does.
+    """
+    positions = {}
+    for i, header in enumerate(values[0]):
+        positions[header] = i
+    frame = pd.DataFrame(values[1:], dtype=object)
+    frame = frame.reindex(columns=list(positions.values()))
+    frame.columns = list(positions)
+    return frame.fillna("")
+
+def frame_entry_ids(frame, id_columns=None):
+    """Compute entry IDs for every row at once.
+
+    With `id_columns`, matches generate_entry_id(): blake2b over the JSON
+    encoding of those columns. Without, matches generate_legacy_entry_id():
+    the MD5 of the row's cells concatenated in column order.
+    """
+    if frame.empty:
+        return pd.Series([], index=frame.index, dtype=object)
+    
+    if id_columns is not None:
+        if not any(column in frame.columns for column in id_columns):
+            raise ValueError(f"None of the identity columns {list(id_columns)} are in the sheet")
+        keys = frame.reindex(columns=list(id_columns), fill_value="").astype(str).values.tolist()
+        return pd.Series(
+            [hashlib.blake2b(json.dumps(key, ensure_ascii=False, separators=(',', ':')).encode('utf-8'),
+                             digest_size=16).hexdigest() for key in keys],
+            index=frame.index, dtype=object)
+    
+    cells = frame.astype(str)
+    joined = cells.iloc[:, 0].str.cat([cells.iloc[:, i] for i in range(1, cells.shape[1])])
+    return pd.Series(
+        [hashlib.md5(row.encode()).hexdigest() for row in joined],
+        index=frame.index, dtype=object)
+
+def export_parquet(frame, path, source=None):
+    """Write the responses to Parquet; `{name}` in the path becomes the source name."""
+    if source and '{name}' in path:
+        path = path.replace('{name}', re.sub(r'[^A-Za-z0-9_.-]+', '_', source['name']))
+    frame.to_parquet(path, index=False, engine='pyarrow')
+    print(f"Exported {len(frame)} responses to {path}")
+    return path
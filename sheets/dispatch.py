@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+import time
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from rate_limit import TokenBucket
+from smtp_transport import ThreadLocalTransport
+
+# Constants
+DEFAULT_CONCURRENCY = 4
+DEFAULT_DOMAIN_RATE = 60  # Messages per minute to any one recipient domain
+MAX_PENDING = 1000  # Jobs read ahead of the workers while their domains wait for the rate limit
+DEFAULT_DOMAIN_RATES = {
+    'gmail.com': 60,
+    'googlemail.com': 60,
+    'outlook.com': 30,
+    'hotmail.com': 30,
+    'live.com': 30
+}
+
+def recipient_domain(recipient):
+    """Return the lower-cased domain of an email address."""
+    return recipient.rsplit('@', 1)[-1].strip().lower()
+
+def parse_domain_rates(values):
+    """Parse ['gmail.com=60', ...] into {'gmail.com': 60.0}."""
+    rates = {}
+    for value in values or []:
+        domain, _, rate = value.partition('=')
+        if not domain or not rate:
+            raise ValueError(f"Expected DOMAIN=PER_MINUTE, got {value!r}")
+        rates[domain.strip().lower()] = positive_rate(rate)
+    return rates
+
+def positive_rate(value):
+    """Parse a per-minute rate; zero or less would leave a token bucket that never refills."""
+    try:
+        rate = float(value)
+    except ValueError:
+        raise ValueError(f"Expected a number of messages per minute, got {value!r}") from None
+    if rate <= 0:
+        raise ValueError(f"Rate must be above zero, got {value!r}")
+    return rate
+
+def rate_type(value):
+    """argparse type for --default-rate, so a bad rate is a usage error."""
+    try:
+        return positive_rate(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+def domain_rate_type(value):
+    """argparse type for --domain-rate; the value is checked and kept for parse_domain_rates()."""
+    try:
+        parse_domain_rates([value])
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return value
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+class DispatchEngine:
+    """Sends messages on a bounded worker pool with per-domain rate limits.
+
+    Each worker thread reuses its own SMTP connection (see
+    ThreadLocalTransport). Scheduling happens on the calling thread: jobs
+    wait in a queue per recipient domain, and one is handed to a worker
+    only once its domain's bucket has a token. Workers therefore never
+    sleep on a rate limit, so each provider (Gmail, Outlook, ...) is
+    throttled on its own and a slow domain does not hold back the rest of
+    the quota. Jobs are read from the iterable only while a worker is free,
+    and at most `max_pending` are held back waiting for their domain, so
+    they can be streamed in from a generator.
+    """
+
+    def __init__(self, transport_factory, concurrency=DEFAULT_CONCURRENCY,
+                 domain_rates=None, default_rate=DEFAULT_DOMAIN_RATE, max_pending=MAX_PENDING):
+        self.transport = ThreadLocalTransport(transport_factory)
+        self.concurrency = concurrency
+        self.max_pending = max_pending
+        self.domain_rates = dict(DEFAULT_DOMAIN_RATES)
+        self.domain_rates.update(domain_rates or {})
+        self.default_rate = default_rate
+        self._buckets = {}
+        self._buckets_lock = threading.Lock()
+        self.latencies = []
+        self.sent = 0
+        self.failed = 0
+        self.elapsed = 0.0
+
+    def _bucket(self, domain):
+        with self._buckets_lock:
+            bucket = self._buckets.get(domain)
+            if bucket is None:
+                rate = self.domain_rates.get(domain, self.default_rate)
+                bucket = TokenBucket.per_minute(rate, burst=1)
+                self._buckets[domain] = bucket
+            return bucket
+
+    def _send(self, key, recipient, msg):
+        start = time.perf_counter()
+        try:
+            self.transport.send(msg)
+        except Exception as e:
+            return key, False, e, time.perf_counter() - start
+        return key, True, None, time.perf_counter() - start
+
+    def run(self, jobs):
+        """Send every (key, recipient, message) job, yielding (key, success, error).
+
+        Results are yielded in completion order as they arrive. Jobs for
+        different domains may be sent out of order; jobs for one domain are
+        sent in the order they were given.
+        """
+        start = time.perf_counter()
+        jobs = iter(jobs)
+        pending = {}  # Domain -> deque of jobs waiting for a token
+        waiting = 0
+        exhausted = False
+        in_flight = set()
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+                while True:
+                    # Hand every job whose domain has a token to a free worker
+                    next_token = None
+                    for domain in list(pending):
+                        domain_jobs = pending[domain]
+                        while domain_jobs and len(in_flight) < self.concurrency:
+                            delay = self._bucket(domain).try_acquire()
+                            if delay:
+                                next_token = delay if next_token is None else min(next_token, delay)
+                                break
+                            in_flight.add(pool.submit(self._send, *domain_jobs.popleft()))
+                            waiting -= 1
+                        if not domain_jobs:
+                            del pending[domain]
+
+                    # A worker is free and nothing can be sent yet: read the next job
+                    if not exhausted and len(in_flight) < self.concurrency and waiting < self.max_pending:
+                        job = next(jobs, None)
+                        if job is None:
+                            exhausted = True
+                        else:
+                            pending.setdefault(recipient_domain(job[1]), deque()).append(job)
+                            waiting += 1
+                            continue
+
+                    if exhausted and not pending and not in_flight:
+                        break
+                    # Wait for a worker to finish or the next domain token, whichever is first
+                    if in_flight:
+                        done, in_flight = wait(in_flight, timeout=next_token, return_when=FIRST_COMPLETED)
+                        yield from self._collect(done)
+                    elif next_token:
+                        time.sleep(next_token)
+        finally:
+            self.elapsed += time.perf_counter() - start
+            self.transport.close()
+
+    def _collect(self, futures):
+        for future in futures:
+            key, success, error, latency = future.result()
+            self.latencies.append(latency)
+            if success:
+                self.sent += 1
+            else:
+                self.failed += 1
+            yield key, success, error
+
+    def report(self):
+        """Return throughput and latency percentiles (seconds) as a dict."""
+        latencies = sorted(self.latencies)
+        return {
+            'sent': self.sent,
+            'failed': self.failed,
+            'seconds': self.elapsed,
+            'messages_per_second': self.sent / self.elapsed if self.elapsed else 0.0,
+            'connections': self.transport.connections_opened,
+            'p50': percentile(latencies, 0.50),
+            'p90': percentile(latencies, 0.90),
+            'p99': percentile(latencies, 0.99),
+            'max': latencies[-1] if latencies else 0.0
+        }
+
+    def print_report(self):
+        r = self.report()
+        print(f"Dispatched {r['sent']} emails ({r['failed']} failed) in {r['seconds']:.1f}s "
+              f"- {r['messages_per_second']:.1f} msg/s over {r['connections']} SMTP connection(s)")
+        print(f"Send latency p50 {r['p50'] * 1000:.0f} ms, p90 {r['p90'] * 1000:.0f} ms, "
+              f"p99 {r['p99'] * 1000:.0f} ms, max {r['max'] * 1000:.0f} ms")
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+import os
+import re
+from functools import lru_cache
+import markdown
+
+# Constants
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+DEFAULT_TEMPLATE = 'thank_you'
+RENDER_CACHE_SIZE = 4096  # Distinct comment bodies kept rendered in memory
+MARKDOWN_EXTENSIONS = []
+PLACEHOLDER_RE = re.compile(r'\{\{\s*(\w+)\s*\}\}')
+
+class CompiledTemplate:
+    """A text template with `{{ name }}` placeholders, split into parts once.
+
+    Rendering only joins the literal parts with the values, with no
+    parsing or formatting per message.
+    """
+
+    def __init__(self, source, name='template'):
+        self.name = name
+        self.parts = PLACEHOLDER_RE.split(source)
+        # Odd indices of `parts` are placeholder names, even indices literal text
+        self.fields = set(self.parts[1::2])
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r') as f:
+            return cls(f.read(), os.path.basename(path))
+
+    def render(self, values):
+        missing = self.fields - values.keys()
+        if missing:
+            raise KeyError(f"Template {self.name} needs values for: {', '.join(sorted(missing))}")
+        parts = list(self.parts)
+        parts[1::2] = [str(values[field]) for field in self.parts[1::2]]
+        return ''.join(parts)
+
+class EmailRenderer:
+    """Renders review comments into plain-text and HTML email bodies.
+
+    `<name>.html` and `<name>.txt` are loaded from `template_dir` and
+    compiled once. Comments are converted by a single reused Markdown
+    instance, and the rendered bodies are cached per distinct comment text,
+    so identical comments are only converted once per run.
+
+    Not thread-safe (the Markdown instance holds per-conversion state):
+    use one renderer per thread or process.
+    """
+
+    def __init__(self, template_dir=TEMPLATE_DIR, name=DEFAULT_TEMPLATE, cache_size=RENDER_CACHE_SIZE):
+        self.html_template = CompiledTemplate.load(os.path.join(template_dir, f'{name}.html'))
+        text_path = os.path.join(template_dir, f'{name}.txt')
+        self.text_template = CompiledTemplate.load(text_path) if os.path.exists(text_path) else None
+        self.markdown = markdown.Markdown(extensions=MARKDOWN_EXTENSIONS)
+        self._render_cached = lru_cache(maxsize=cache_size)(self._render)
+
+    def markdown_to_html(self, text):
+        self.markdown.reset()
+        return self.markdown.convert(text)
+
+    def _render(self, comments):
+        values = {'comments_html': self.markdown_to_html(comments), 'comments_text': comments}
+        text = self.text_template.render(values) if self.text_template else None
+        return text, self.html_template.render(values)
+
+    def render(self, comments):
+        """Return (text, html) bodies for a comment string. `text` is None without a .txt template."""
+        return self._render_cached(comments)
+
+    def cache_info(self):
+        return self._render_cached.cache_info()
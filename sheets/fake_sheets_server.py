@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+import re
+import json
+import time
+import random
+import argparse
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs, unquote
+
+# Constants
+DEFAULT_PORT = 8765
+DEFAULT_SHEET_NAME = 'Form Responses 1'
+HEADERS = ['Timestamp', 'Did you?', 'Email Address']
+START_TIME = datetime(2025, 3, 25, 9, 0, 0)
+A1_PATTERN = re.compile(r'^([A-Z]*)(\d*)$')
+
+def column_index(letters):
+    """Convert an A1 column ('A', 'AA') to a 1-based index."""
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - ord('A') + 1
+    return index
+
+class SyntheticSheet:
+    """A form-responses sheet whose rows are generated on demand.
+
+    Row n (1-based, row 1 is the header) is a deterministic function of n,
+    so a 1M-row sheet costs no memory. `rows` is the number of data rows and
+    can be raised while the server runs to simulate new submissions.
+    """
+
+    def __init__(self, rows, title=DEFAULT_SHEET_NAME):
+        self.rows = rows
+        self.title = title
+
+    def row(self, n):
+        if n == 1:
+            return list(HEADERS)
+        timestamp = START_TIME + timedelta(seconds=n)
+        values = [
+            f"{timestamp.month}/{timestamp.day}/{timestamp.year} {timestamp:%H:%M:%S}",
+            'yes' if n % 3 else 'no',
+            f"respondent{n}@example.com"
+        ]
+        # Like the real API, drop trailing empty cells on some rows
+        if n % 17 == 0:
+            values[2] = ''
+            values = values[:2]
+        return values
+
+    def values(self, start_row, end_row, start_col, end_col):
+        end_row = min(end_row, self.rows + 1)
+        result = []
+        for n in range(start_row, end_row + 1):
+            cells = self.row(n)[start_col - 1:end_col]
+            result.append(cells)
+        # Trailing empty rows are omitted
+        while result and not result[-1]:
+            result.pop()
+        return result
+
+def parse_range(range_name, sheet):
+    """Parse an A1 range ('Sheet', "'Sheet'!A2:C", 'Sheet!1:1') into bounds."""
+    if '!' in range_name:
+        name, cells = range_name.rsplit('!', 1)
+    else:
+        name, cells = range_name, ''
+    name = name.strip("'")
+    if name != sheet.title:
+        raise KeyError(f"Unable to parse range: {range_name}")
+
+    max_row = sheet.rows + 1
+    max_col = len(HEADERS)
+    if not cells:
+        return 1, max_row, 1, max_col
+
+    start, _, end = cells.partition(':')
+    end = end or start
+    start_match, end_match = A1_PATTERN.match(start), A1_PATTERN.match(end)
+    if not start_match or not end_match:
+        raise KeyError(f"Unable to parse range: {range_name}")
+    start_col = column_index(start_match.group(1)) if start_match.group(1) else 1
+    start_row = int(start_match.group(2)) if start_match.group(2) else 1
+    end_col = column_index(end_match.group(1)) if end_match.group(1) else max_col
+    end_row = int(end_match.group(2)) if end_match.group(2) else max_row
+    return start_row, end_row, start_col, end_col
+
+class FakeSheetsHandler(BaseHTTPRequestHandler):
+    """Implements spreadsheets.get, values.get and values.batchGet."""
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, body, headers=None):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=UTF-8')
+        self.send_header('Content-Length', str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _send_error(self, status, message):
+        headers = {}
+        if status == 429:
+            headers['Retry-After'] = str(self.server.retry_after)
+        self._send_json(status, {'error': {'code': status, 'message': message}}, headers)
+
+    def _value_range(self, range_name):
+        sheet = self.server.sheet
+        start_row, end_row, start_col, end_col = parse_range(range_name, sheet)
+        body = {'range': range_name, 'majorDimension': 'ROWS'}
+        values = sheet.values(start_row, end_row, start_col, end_col)
+        if values:
+            body['values'] = values
+        return body
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        path = unquote(parsed.path)
+        query = parse_qs(parsed.query)
+
+        if path == '/_stats':
+            self._send_json(200, self.server.stats())
+            return
+
+        self.server.count_request(path)
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if self.server.error_rate and random.random() < self.server.error_rate:
+            self._send_error(random.choice([429, 503]), 'Injected error')
+            return
+
+        try:
+            match = re.match(r'^/v4/spreadsheets/([^/]+)/values:batchGet$', path)
+            if match:
+                ranges = query.get('ranges', [])
+                self._send_json(200, {
+                    'spreadsheetId': match.group(1),
+                    'valueRanges': [self._value_range(r) for r in ranges]
+                })
+                return
+
+            match = re.match(r'^/v4/spreadsheets/([^/]+)/values/(.+)$', path)
+            if match:
+                self._send_json(200, self._value_range(match.group(2)))
+                return
+
+            match = re.match(r'^/v4/spreadsheets/([^/]+)$', path)
+            if match:
+                sheet = self.server.sheet
+                self._send_json(200, {
+                    'spreadsheetId': match.group(1),
+                    'properties': {'title': 'Synthetic form responses'},
+                    'sheets': [{'properties': {
+                        'title': sheet.title,
+                        'gridProperties': {'rowCount': sheet.rows + 1, 'columnCount': len(HEADERS)}
+                    }}]
+                })
+                return
+        except KeyError as e:
+            self._send_error(400, str(e))
+            return
+
+        self._send_error(404, f"Unknown path {path}")
+
+class FakeSheetsServer(ThreadingHTTPServer):
+    """Local stand-in for the Sheets API serving one synthetic sheet.
+
+    Every API request (not /_stats) is counted, can be delayed by `latency`
+    seconds, and fails with a 429 or 503 with probability `error_rate`.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, rows, port=DEFAULT_PORT, host='127.0.0.1', latency=0.0,
+                 error_rate=0.0, retry_after=0, verbose=False):
+        super().__init__((host, port), FakeSheetsHandler)
+        self.sheet = SyntheticSheet(rows)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.verbose = verbose
+        self._lock = threading.Lock()
+        self._counts = {}
+
+    @property
+    def endpoint(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count_request(self, path):
+        kind = 'batchGet' if path.endswith(':batchGet') else 'values.get' if '/values/' in path else 'get'
+        with self._lock:
+            self._counts[kind] = self._counts.get(kind, 0) + 1
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._counts)
+        counts['total'] = sum(counts.values())
+        counts['rows'] = self.sheet.rows
+        return counts
+
+    def start(self):
+        """Serve from a daemon thread and return self."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a local fake Google Sheets API server')
+    parser.add_argument('--rows', type=int, default=1000, help='Number of synthetic data rows')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='Port to listen on')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds of delay added to each request')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='Fraction of requests that fail with 429/503')
+    parser.add_argument('--retry-after', type=int, default=0, help='Retry-After seconds sent with 429s')
+    parser.add_argument('--verbose', action='store_true', help='Log every request')
+    args = parser.parse_args()
+
+    server = FakeSheetsServer(args.rows, args.port, latency=args.latency, error_rate=args.error_rate,
+                              retry_after=args.retry_after, verbose=args.verbose)
+    print(f"Serving {args.rows} synthetic rows at {server.endpoint}")
+    print(f"Point fetch_new_entries.py at it with: SHEETS_API_ENDPOINT={server.endpoint}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopped.")
+
+if __name__ == "__main__":
+    main()
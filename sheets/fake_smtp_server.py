@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+import time
+import asyncio
+import argparse
+import threading
+from aiosmtpd.controller import Controller
+
+# Constants
+DEFAULT_PORT = 1025
+
+class CountingHandler:
+    """aiosmtpd handler that accepts every message and counts it.
+
+    Messages are kept in memory (up to `keep` of them) so tests can inspect
+    them. With `drop_every`, every Nth message on a connection is answered
+    with 421 and the connection is closed, to exercise reconnect logic.
+    """
+
+    def __init__(self, latency=0.0, drop_every=0, keep=1000, verbose=False):
+        self.latency = latency
+        self.drop_every = drop_every
+        self.keep = keep
+        self.verbose = verbose
+        self.messages = []
+        self.count = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._per_connection = {}
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        with self._lock:
+            self.connections += 1
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        key = id(session)
+        with self._lock:
+            seen = self._per_connection.get(key, 0) + 1
+            self._per_connection[key] = seen
+            if self.drop_every and seen % self.drop_every == 0:
+                # The reply is written as soon as this returns; close once it is on its way
+                asyncio.get_running_loop().call_soon(server.transport.close)
+                return '421 Closing connection (injected)'
+            self.count += 1
+            if len(self.messages) < self.keep:
+                self.messages.append((envelope.mail_from, list(envelope.rcpt_tos), envelope.content))
+
+        if self.verbose:
+            print(f"Message {self.count} from {envelope.mail_from} to {', '.join(envelope.rcpt_tos)}")
+        return '250 Message accepted for delivery'
+
+class FakeSMTPServer:
+    """In-process SMTP stand-in for testing generate_emails.py without a real server."""
+
+    def __init__(self, port=DEFAULT_PORT, host='127.0.0.1', **handler_options):
+        self.handler = CountingHandler(**handler_options)
+        self.controller = Controller(self.handler, hostname=host, port=port)
+
+    @property
+    def host(self):
+        return self.controller.hostname
+
+    @property
+    def port(self):
+        return self.controller.port
+
+    def start(self):
+        self.controller.start()
+        return self
+
+    def stop(self):
+        self.controller.stop()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a local SMTP server that accepts and counts messages')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='Port to listen on')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds of delay per message')
+    parser.add_argument('--drop-every', type=int, default=0,
+                        help='Answer every Nth message on a connection with 421 and close it')
+    parser.add_argument('--quiet', action='store_true', help='Do not log each message')
+    args = parser.parse_args()
+
+    server = FakeSMTPServer(args.port, latency=args.latency, drop_every=args.drop_every,
+                            verbose=not args.quiet).start()
+    print(f"Fake SMTP server listening on {server.host}:{server.port}")
+    print(f"Use it with: SMTP_HOST={server.host} SMTP_PORT={server.port} SMTP_STARTTLS=0")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
+        print(f"\nStopped after {server.handler.count} messages over {server.handler.connections} connections.")
+
+if __name__ == "__main__":
+    main()
@@ -1,129 +1,373 @@
 #!/usr/bin/env python3
 import os
-import sys
 import json
-import csv
-import io
 import hashlib
+import time
 import argparse
-from googleapiclient.discovery import build
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from processed_store import ProcessedStore
+from storage_layout import sharded_dir
+from sheets_client import get_sheets_client, configure_read_quota, READ_QUOTA_PER_MINUTE
 
 # Set up constants
 SPREADSHEET_ID = '1FmBo8Ceq7sr01lHrpblOBEUf5_aogeMWcJDYnX7Hi0Q'
 RANGE_NAME = 'Form Responses 1'  # Fixed to match the actual sheet name with spaces
 SCOPES = ['https://www.googleapis.com/auth/spreadsheets.readonly']
-PROCESSED_FILE = 'processed_entries.json'
+PROCESSED_FILE = 'processed_entries.json'  # Legacy list, migrated into PROCESSED_DB
+PROCESSED_DB = 'processed_entries.db'
 OUTPUT_DIR = 'markdown_files'
 TOKEN_FILE = 'token.json'
+DEFAULT_SOURCE = {
+    'name': 'default',
+    'spreadsheet_id': SPREADSHEET_ID,
+    'range': RANGE_NAME,
+    'output_dir': OUTPUT_DIR
+}
+MAX_WORKERS = 4  # Sources fetched concurrently with --config
+CHUNK_SIZE = 5000  # Rows per request in streaming mode
+ID_COLUMNS = ['Timestamp', 'Email Address']  # Columns that identify a response
+ID_SCHEME_KEY = 'key'  # blake2b over the identity columns
+ID_SCHEME_LEGACY = 'legacy'  # MD5 over all values, used before ID_COLUMNS existed
+WATCH_MIN_INTERVAL = 15  # Seconds between polls when the sheet is busy
+WATCH_MAX_INTERVAL = 600  # Seconds between polls when the sheet is idle
+WATCH_BACKOFF = 2  # Interval multiplier after a poll with no new rows
+WATCH_STATS_FILE = 'watch_stats.json'
 
 def setup_sheets_api():
-    """Set up and return the Google Sheets API client using OAuth."""
-    creds = None
-    # The token.json file stores the user's access and refresh tokens
-    if os.path.exists(TOKEN_FILE):
-        creds = Credentials.from_authorized_user_info(
-            json.load(open(TOKEN_FILE)), SCOPES)
-    
-    # If there are no valid credentials, let the user log in
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            # Check if credentials.json exists
-            if not os.path.exists('credentials.json'):
-                print("Error: credentials.json file not found!")
-                print("Please download OAuth 2.0 Client ID credentials from the Google Cloud Console")
-                print("and save them as credentials.json in the current directory.")
-                sys.exit(1)
-                
-            flow = InstalledAppFlow.from_client_secrets_file(
-                'credentials.json', SCOPES)
-            creds = flow.run_local_server(port=0)
-        
-        # Save the credentials for the next run
-        with open(TOKEN_FILE, 'w') as token:
-            token.write(creds.to_json())
-    
-    return build('sheets', 'v4', credentials=creds, cache_discovery=False)
-
-def get_sheet_data():
-    """Retrieve data from Google Sheets."""
+    """Return the Google Sheets API service from the process-wide client."""
+    return get_sheets_client(SCOPES, TOKEN_FILE).service
+
+def column_letter(index):
+    """Convert a 1-based column index to its A1 letter (1 -> A, 27 -> AA)."""
+    letters = ''
+    while index > 0:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+def rows_to_dicts(headers, rows):
+    """Convert raw sheet rows to dictionaries keyed by header."""
+    data = []
+    for row in rows:
+        # Create a dictionary for each row
+        row_dict = {}
+        for i, header in enumerate(headers):
+            row_dict[header] = row[i] if i < len(row) else ""
+        data.append(row_dict)
+    return data
+
+def make_watermark(headers, last_row, last_values):
+    """Build a watermark from the header row and the last row read.
+
+    A sheet with no data rows gets `last_row` 1 (the header row) and no
+    timestamp, so later runs can still use the cheap incremental probe.
+    """
+    timestamp_col = headers.index('Timestamp') if 'Timestamp' in headers else 0
+    last_timestamp = last_values[timestamp_col] if len(last_values) > timestamp_col else ""
+    return {
+        'last_row': last_row,
+        'last_timestamp': last_timestamp,
+        'headers': headers
+    }
+
+def source_key(source):
+    """Return the dedup namespace and watermark key for a source."""
+    return source.get('namespace') or f"{source['spreadsheet_id']}:{source['range']}"
+
+def load_sources(config_path):
+    """Load the list of spreadsheet/range sources from a JSON config file.
+
+    The file holds {"max_workers": N, "sources": [...]}, where each source
+    has `spreadsheet_id` and `range` and optionally `name`, `output_dir`
+    and `namespace`.
+    """
+    with open(config_path, 'r') as f:
+        config = json.load(f)
+    
+    sources = []
+    for i, entry in enumerate(config.get('sources', [])):
+        if 'spreadsheet_id' not in entry or 'range' not in entry:
+            raise ValueError(f"Source {i} in {config_path} needs 'spreadsheet_id' and 'range'")
+        source = dict(entry)
+        source.setdefault('name', f"{entry['spreadsheet_id']}:{entry['range']}")
+        source.setdefault('output_dir', OUTPUT_DIR)
+        sources.append(source)
+    return sources, config.get('max_workers', MAX_WORKERS)
+
+def get_sheet_values(source=DEFAULT_SOURCE):
+    """Retrieve the raw values (header row first) of a whole sheet."""
     try:
-        print(f"Attempting to access spreadsheet with ID: {SPREADSHEET_ID}")
-        print(f"Using range: {RANGE_NAME}")
+        print(f"Attempting to access spreadsheet with ID: {source['spreadsheet_id']}")
+        print(f"Using range: {source['range']}")
         
         service = setup_sheets_api()
         sheet = service.spreadsheets()
         
         # First try to get metadata about the spreadsheet
         try:
-            metadata = sheet.get(spreadsheetId=SPREADSHEET_ID).execute()
+            metadata = sheet.get(spreadsheetId=source['spreadsheet_id']).execute()
             print(f"Successfully accessed spreadsheet: {metadata.get('properties', {}).get('title', 'Unknown')}")
             print(f"Available sheets: {[s.get('properties', {}).get('title', 'Unknown') for s in metadata.get('sheets', [])]}")
         except Exception as e:
             print(f"Error accessing spreadsheet metadata: {e}")
         
         # Now try to get the actual data
-        result = sheet.values().get(spreadsheetId=SPREADSHEET_ID,
-                                   range=RANGE_NAME).execute()
+        result = sheet.values().get(spreadsheetId=source['spreadsheet_id'],
+                                   range=source['range']).execute()
         values = result.get('values', [])
         
         if not values:
             print('No data found.')
-            return []
-            
-        print(f"Successfully retrieved {len(values)-1} rows of data")
-        
-        # Convert to list of dictionaries
-        headers = values[0]
-        data = []
-        
-        for row in values[1:]:
-            # Create a dictionary for each row
-            row_dict = {}
-            for i, header in enumerate(headers):
-                row_dict[header] = row[i] if i < len(row) else ""
-            data.append(row_dict)
-            
-        return data
+        else:
+            print(f"Successfully retrieved {len(values)-1} rows of data")
+        return values
     except Exception as e:
+        # Quota and server errors have already been retried; let the caller
+        # see the failure rather than mistaking it for an empty sheet
         print(f"Error retrieving sheet data: {e}")
-        return []
+        raise
+
+def get_sheet_data(source=DEFAULT_SOURCE):
+    """Retrieve all data from Google Sheets.
 
-def get_processed_entries():
-    """Get list of already processed entry IDs."""
-    if not os.path.exists(PROCESSED_FILE):
-        return []
+    Returns a tuple of (rows, watermark) where watermark describes the last
+    row read, or (rows, None) if nothing could be read.
+    """
+    values = get_sheet_values(source)
+    if not values:
+        return [], None
     
-    try:
-        with open(PROCESSED_FILE, 'r') as f:
-            return json.load(f)
-    except Exception as e:
-        print(f"Error reading processed entries file: {e}")
-        return []
+    # Convert to list of dictionaries
+    headers = values[0]
+    data = rows_to_dicts(headers, values[1:])
+    
+    # The header is sheet row 1, so the last data row is row len(values)
+    watermark = make_watermark(headers, len(values), values[-1] if len(values) > 1 else [])
+    return data, watermark
+
+def get_new_sheet_data(watermark, source=DEFAULT_SOURCE):
+    """Retrieve only the rows appended after the watermark.
 
-def save_processed_entries(processed_entries):
-    """Save the list of processed entry IDs."""
+    Fetches the header row and everything from the watermark row onwards in a
+    single batchGet. The watermark row is re-read so that its Timestamp can be
+    checked; if it or the header row no longer match (rows were deleted,
+    sorted or a column was added), falls back to a full read.
+    """
+    if not watermark:
+        print("No watermark stored yet, doing a full read.")
+        return get_sheet_data(source)
+    
     try:
-        with open(PROCESSED_FILE, 'w') as f:
-            json.dump(processed_entries, f)
+        service = setup_sheets_api()
+        last_row = watermark['last_row']
+        last_col = column_letter(max(len(watermark['headers']), 1))
+        # Re-read the watermark row itself (unless it is the header row)
+        start_row = last_row if last_row > 1 else 2
+        header_range = f"'{source['range']}'!1:1"
+        rows_range = f"'{source['range']}'!A{start_row}:{last_col}"
+        
+        result = service.spreadsheets().values().batchGet(
+            spreadsheetId=source['spreadsheet_id'],
+            ranges=[header_range, rows_range]).execute()
+        value_ranges = result.get('valueRanges', [])
+        header_values = value_ranges[0].get('values', []) if value_ranges else []
+        rows = value_ranges[1].get('values', []) if len(value_ranges) > 1 else []
+        headers = header_values[0] if header_values else []
+        
+        if headers != watermark['headers']:
+            print("Header row has changed since the last run, doing a full read.")
+            return get_sheet_data(source)
+        
+        if last_row > 1:
+            anchor = make_watermark(headers, last_row, rows[0] if rows else [])
+            if anchor['last_timestamp'] != watermark['last_timestamp']:
+                print(f"Row {last_row} no longer matches the stored watermark, doing a full read.")
+                return get_sheet_data(source)
+            rows = rows[1:]
+        
+        if not rows:
+            return [], watermark
+        
+        print(f"Successfully retrieved {len(rows)} new rows after row {last_row}")
+        new_last_row = max(last_row, 1) + len(rows)
+        return rows_to_dicts(headers, rows), make_watermark(headers, new_last_row, rows[-1])
     except Exception as e:
-        print(f"Error saving processed entries: {e}")
+        print(f"Error retrieving new sheet data: {e}")
+        raise
+
+class SheetRowStream:
+    """Iterate over sheet rows in fixed-size windows instead of one full read.
+
+    Each window is one values.get request for `chunk_size` rows, and rows are
+    yielded as dictionaries as soon as their window arrives, so memory stays
+    flat however large the sheet is. When started from a watermark, reading
+    resumes after it (falling back to row 2 if the header row or the
+    watermark row changed). `self.watermark` always describes the last row
+    yielded. `window_done`, if given, is called once the last row of a
+    window has been consumed and before the next window is requested.
+    """
+
+    def __init__(self, watermark=None, chunk_size=CHUNK_SIZE, source=DEFAULT_SOURCE, window_done=None):
+        self.watermark = watermark
+        self.source = source
+        self.chunk_size = chunk_size
+        self.window_done = window_done
+        self.rows_read = 0
+        self.requests = 0
+
+    def _get_values(self, values_api, range_name):
+        self.requests += 1
+        result = values_api.get(spreadsheetId=self.source['spreadsheet_id'], range=range_name).execute()
+        return result.get('values', [])
+
+    def __iter__(self):
+        values_api = setup_sheets_api().spreadsheets().values()
+        sheet_name = self.source['range']
+        header_values = self._get_values(values_api, f"'{sheet_name}'!1:1")
+        if not header_values:
+            print('No data found.')
+            return
+        headers = header_values[0]
+        last_col = column_letter(len(headers))
+        
+        # Work out where to resume; the watermark row itself is re-read and checked
+        start_row = 2
+        watermark = self.watermark
+        if watermark and watermark['headers'] != headers:
+            print("Header row has changed since the last run, reading from the start.")
+            watermark = None
+        if watermark and watermark['last_row'] > 1:
+            anchor = self._get_values(
+                values_api, f"'{sheet_name}'!A{watermark['last_row']}:{last_col}{watermark['last_row']}")
+            anchor_row = anchor[0] if anchor else []
+            if make_watermark(headers, watermark['last_row'], anchor_row)['last_timestamp'] != watermark['last_timestamp']:
+                print(f"Row {watermark['last_row']} no longer matches the stored watermark, reading from the start.")
+            else:
+                start_row = watermark['last_row'] + 1
+        
+        if start_row == 2:
+            # Reading from the top: a sheet without data rows still gets a watermark on the header
+            self.watermark = make_watermark(headers, 1, [])
+        
+        while True:
+            end_row = start_row + self.chunk_size - 1
+            rows = self._get_values(values_api, f"'{sheet_name}'!A{start_row}:{last_col}{end_row}")
+            if rows:
+                print(f"Retrieved rows {start_row}-{start_row + len(rows) - 1}")
+            
+            for offset, row in enumerate(rows):
+                self.rows_read += 1
+                self.watermark = make_watermark(headers, start_row + offset, row)
+                yield rows_to_dicts(headers, [row])[0]
+            if self.window_done:
+                self.window_done()
+            
+            # A short window means we've reached the end of the sheet
+            if len(rows) < self.chunk_size:
+                break
+            start_row = end_row + 1
 
-def generate_entry_id(row):
-    """Generate a unique ID for a row entry based on its content."""
+def encode_identity(row, id_columns=ID_COLUMNS):
+    """Canonical, separator-safe encoding of a row's identity columns."""
+    if not any(column in row for column in id_columns):
+        raise ValueError(f"None of the identity columns {list(id_columns)} are in the sheet; "
+                         "set them with --id-columns")
+    # A JSON array can't be confused by values containing separators
+    key = [str(row.get(column, "")) for column in id_columns]
+    return json.dumps(key, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def generate_entry_id(row, id_columns=ID_COLUMNS):
+    """Generate a stable ID for a row entry from its identity columns.
+
+    Only the identity columns are hashed, so adding, reordering or editing
+    other columns does not change the ID.
+    """
+    return hashlib.blake2b(encode_identity(row, id_columns), digest_size=16).hexdigest()
+
+def generate_legacy_entry_id(row):
+    """Generate the original content-based ID (MD5 of all values joined)."""
     # Create a string from all the row data
     row_str = ''.join(str(item) for item in row.values())
     # Hash it to create a unique identifier
     return hashlib.md5(row_str.encode()).hexdigest()
 
-def create_markdown_file(row, entry_id):
-    """Create a markdown file for the entry with space for comments."""
-    # Ensure output directory exists
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
+def source_id_columns(source, args):
+    """Identity columns for a source: its config entry, else --id-columns."""
+    return source.get('id_columns') or args.id_columns
+
+def ensure_id_scheme(processed_entries):
+    """Return a store's entry ID scheme, deciding and committing it on first use.
+
+    Sources whose store already holds content-hash IDs keep using them
+    until --migrate-ids has been run, so upgrading does not make every
+    historical row look new. Empty stores start on identity-column IDs.
+    The decision is committed straight away so no write transaction is
+    left open while the sheet is fetched.
+    """
+    scheme = processed_entries.get_id_scheme()
+    if scheme is None:
+        scheme = ID_SCHEME_LEGACY if len(processed_entries) else ID_SCHEME_KEY
+        processed_entries.set_id_scheme(scheme)
+        processed_entries.commit()
+    return scheme
+
+def entry_id_function(processed_entries, args, source=DEFAULT_SOURCE):
+    """Return the ID function to use for a source (see ensure_id_scheme)."""
+    scheme = ensure_id_scheme(processed_entries)
+    
+    if scheme == ID_SCHEME_LEGACY:
+        print(f"Note: {source['name']} still uses content-hash entry IDs; "
+              "run with --migrate-ids to switch to stable identity-column IDs.")
+        return generate_legacy_entry_id
+    
+    id_columns = source_id_columns(source, args)
+    return lambda row: generate_entry_id(row, id_columns)
+
+def migrate_entry_ids(processed_entries, args, source=DEFAULT_SOURCE):
+    """Switch a source from content-hash IDs to identity-column IDs.
+
+    Reads the whole sheet and, for every row whose legacy ID is already
+    processed, records its new ID too and renames its pending markdown file.
+    Legacy IDs are computed both over the current header row and over the
+    header row stored with the watermark, so rows whose IDs were already
+    broken by an added column are still recognised. Returns the number of
+    rows migrated.
+    """
+    values = get_sheet_values(source)
+    id_columns = source_id_columns(source, args)
+    pending = sharded_dir(source.get('output_dir', OUTPUT_DIR))
+    watermark = processed_entries.get_watermark(source_key(source))
+    migrated = 0
+    
+    if values:
+        headers = values[0]
+        old_headers = watermark['headers'] if watermark else headers
+        for row in rows_to_dicts(headers, values[1:]):
+            legacy_ids = {
+                generate_legacy_entry_id(row),
+                generate_legacy_entry_id({h: row.get(h, "") for h in old_headers})
+            }
+            known = [legacy_id for legacy_id in legacy_ids if legacy_id in processed_entries]
+            if not known:
+                continue
+            
+            entry_id = generate_entry_id(row, id_columns)
+            processed_entries.add(entry_id)
+            migrated += 1
+            for legacy_id in known:
+                old_file = pending.locate(legacy_id)
+                if old_file:
+                    pending.add_file(old_file, entry_id)
+                    pending.forget(legacy_id)
+    
+    processed_entries.set_id_scheme(ID_SCHEME_KEY)
+    processed_entries.commit()
+    print(f"Migrated {migrated} entries of {source['name']} to identity-column IDs ({', '.join(id_columns)})")
+    return migrated
+
+def create_markdown_file(row, entry_id, output_dir=OUTPUT_DIR):
+    """Create a markdown file for the entry (in its shard of output_dir) with space for comments."""
+    directory = sharded_dir(output_dir)
     
     # Extract data - adjusting field names based on the spreadsheet
     timestamp = row.get('Timestamp', 'Unknown Date')
@@ -147,13 +391,246 @@ def create_markdown_file(row, entry_id):
 
 """
     
-    # Write to file
-    filename = f"{OUTPUT_DIR}/{entry_id}.md"
+    # Write to file; its shard directory is only created the first time
+    filename = directory.prepare(entry_id)
     with open(filename, 'w') as f:
         f.write(markdown_content)
+    directory.record(entry_id)
     
     return filename
 
+def process_new_entries(processed_entries, args, source=DEFAULT_SOURCE):
+    """Fetch rows, create markdown files for unseen entries and advance the watermark.
+
+    Returns the number of new entries processed.
+    """
+    new_entries_count = 0
+    incremental = args.incremental and not args.force_all
+    key = source_key(source)
+    start_watermark = processed_entries.get_watermark(key) if incremental else None
+    
+    if args.columnar:
+        return process_new_entries_columnar(processed_entries, args, source)
+    
+    make_entry_id = entry_id_function(processed_entries, args, source)
+    
+    if args.stream:
+        # Rows are fetched window by window while the loop below runs; each window's
+        # inserts are committed before the next request, so no lock is held over the network
+        rows = SheetRowStream(start_watermark, args.chunk_size, source, window_done=processed_entries.commit)
+    else:
+        # Get sheet data, only the rows after the stored watermark if incremental
+        if incremental:
+            rows, watermark = get_new_sheet_data(start_watermark, source)
+        else:
+            rows, watermark = get_sheet_data(source)
+        
+        if not rows:
+            print("No data to process.")
+            # Still remember a header-only sheet, so the next run can use the cheap probe
+            if watermark and watermark != start_watermark:
+                processed_entries.set_watermark(key, **watermark)
+                processed_entries.commit()
+            return 0
+    
+    for row in rows:
+        entry_id = make_entry_id(row)
+        
+        if args.force_all or entry_id not in processed_entries:
+            filename = create_markdown_file(row, entry_id, source.get('output_dir', OUTPUT_DIR))
+            processed_entries.add(entry_id)
+            new_entries_count += 1
+            print(f"Created markdown file: {filename}")
+    
+    if args.stream:
+        watermark = rows.watermark
+        print(f"Streamed {rows.rows_read} rows in {rows.requests} requests")
+    
+    # Advance the watermark in the same transaction as the new entries
+    if watermark:
+        processed_entries.set_watermark(key, **watermark)
+    processed_entries.commit()
+    
+    return new_entries_count
+
+def process_new_entries_columnar(processed_entries, args, source=DEFAULT_SOURCE):
+    """Full-read variant of process_new_entries built on a pandas DataFrame.
+
+    Entry IDs are computed for the whole batch and already-processed IDs
+    are filtered out with one set lookup; only the new rows are turned into
+    dictionaries for markdown files. With --parquet the full response
+    history is also written out for analysis.
+    """
+    # Imported here so pandas/pyarrow are only needed for --columnar
+    import columnar
+    
+    values = get_sheet_values(source)
+    if not values:
+        print("No data to process.")
+        return 0
+    
+    frame = columnar.values_to_frame(values)
+    if entry_id_function(processed_entries, args, source) is generate_legacy_entry_id:
+        frame['entry_id'] = columnar.frame_entry_ids(frame)
+    else:
+        frame['entry_id'] = columnar.frame_entry_ids(frame, source_id_columns(source, args))
+    
+    if args.parquet:
+        columnar.export_parquet(frame, args.parquet, source)
+    
+    if args.force_all:
+        new_rows = frame
+    else:
+        known = processed_entries.known_ids(frame['entry_id'])
+        new_rows = frame[~frame['entry_id'].isin(known)]
+    # Repeated responses within the batch get one file, as in the dictionary path
+    new_rows = new_rows.drop_duplicates('entry_id')
+    
+    output_dir = source.get('output_dir', OUTPUT_DIR)
+    for row in new_rows.to_dict('records'):
+        entry_id = row.pop('entry_id')
+        filename = create_markdown_file(row, entry_id, output_dir)
+        processed_entries.add(entry_id)
+        print(f"Created markdown file: {filename}")
+    
+    last_values = values[-1] if len(values) > 1 else []
+    processed_entries.set_watermark(source_key(source), **make_watermark(values[0], len(values), last_values))
+    processed_entries.commit()
+    return len(new_rows)
+
+def sheet_has_new_rows(watermark, source=DEFAULT_SOURCE):
+    """Cheap change check: is the cell below the watermark row non-empty?"""
+    next_row = watermark['last_row'] + 1
+    result = setup_sheets_api().spreadsheets().values().get(
+        spreadsheetId=source['spreadsheet_id'],
+        range=f"'{source['range']}'!A{next_row}:A{next_row}").execute()
+    return bool(result.get('values'))
+
+def save_watch_stats(stats):
+    """Atomically write the watch counters so they can be read by other tools."""
+    tmp_file = f"{WATCH_STATS_FILE}.tmp"
+    with open(tmp_file, 'w') as f:
+        json.dump(stats, f, indent=2)
+    os.replace(tmp_file, WATCH_STATS_FILE)
+
+def open_store(source, read_only=False):
+    """Open the processed entries store in the namespace of a source.
+
+    Entries recorded before sources had namespaces (including a legacy
+    processed_entries.json) belong to the default spreadsheet. The entry ID
+    scheme is settled here, before any network I/O. A read-only store
+    works on an in-memory copy and never writes to disk.
+    """
+    is_default = source_key(source) == source_key(DEFAULT_SOURCE)
+    processed_entries = ProcessedStore(
+        PROCESSED_DB,
+        PROCESSED_FILE if is_default else None,
+        namespace=source_key(source),
+        legacy_namespace=source_key(DEFAULT_SOURCE),
+        read_only=read_only)
+    ensure_id_scheme(processed_entries)
+    return processed_entries
+
+def ingest_source(source, args):
+    """Fetch and process one source with its own store connection."""
+    with open_store(source) as processed_entries:
+        return process_new_entries(processed_entries, args, source)
+
+def migrate_source(source, args):
+    """Migrate one source to identity-column IDs with its own store connection."""
+    with open_store(source) as processed_entries:
+        return migrate_entry_ids(processed_entries, args, source)
+
+def run_sources(sources, args, max_workers, task=ingest_source):
+    """Run `task(source, args)` for every source on a bounded thread pool.
+
+    Returns a dict mapping source name to the task's result. A failing
+    source is reported and recorded as an exception without stopping the
+    others; with a single source the exception propagates instead.
+    """
+    if len(sources) == 1:
+        return {sources[0]['name']: task(sources[0], args)}
+    
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(task, source, args): source for source in sources}
+        for future in as_completed(futures):
+            name = futures[future]['name']
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                print(f"Error processing source {name}: {e}")
+                results[name] = e
+    return results
+
+def poll_source(source, args):
+    """Fetch a source only if its cheap change check says it has new rows.
+
+    Returns the number of new entries, or None if the fetch was skipped.
+    """
+    with open_store(source) as processed_entries:
+        watermark = processed_entries.get_watermark(source_key(source))
+        if args.force_all or not watermark or sheet_has_new_rows(watermark, source):
+            return process_new_entries(processed_entries, args, source)
+    return None
+
+def watch(sources, args, max_workers):
+    """Stay resident and poll the sources, fetching only when they have changed.
+
+    Each poll first asks for the single cell below the stored watermark and
+    only runs a full incremental fetch when it is non-empty (or when there
+    is no watermark yet). The interval halves after a poll that found new
+    rows and grows by WATCH_BACKOFF after idle polls, within
+    [--min-interval, --max-interval].
+    """
+    args.incremental = True
+    interval = args.min_interval
+    stats = {
+        'polls': 0,
+        'fetches': 0,
+        'skipped_fetches': 0,
+        'new_rows': 0,
+        'errors': 0,
+        'interval': interval,
+        'last_poll': None
+    }
+    names = ', '.join(source['name'] for source in sources)
+    print(f"Watching {len(sources)} source(s): {names}. Press Ctrl+C to stop.")
+    
+    while True:
+        stats['polls'] += 1
+        stats['last_poll'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+        new_rows = 0
+        try:
+            results = run_sources(sources, args, max_workers, task=poll_source)
+        except Exception as e:
+            print(f"Error during poll: {e}")
+            results = {sources[0]['name']: e}
+        args.force_all = False
+        
+        for result in results.values():
+            if isinstance(result, Exception):
+                stats['errors'] += 1
+            elif result is None:
+                stats['skipped_fetches'] += 1
+            else:
+                stats['fetches'] += 1
+                new_rows += result
+        
+        stats['new_rows'] += new_rows
+        if new_rows:
+            interval = max(args.min_interval, interval / 2)
+        else:
+            interval = min(args.max_interval, interval * WATCH_BACKOFF)
+        stats['interval'] = interval
+        save_watch_stats(stats)
+        
+        print(f"Poll {stats['polls']}: {new_rows} new rows "
+              f"(fetches: {stats['fetches']}, skipped: {stats['skipped_fetches']}, "
+              f"total new: {stats['new_rows']}, errors: {stats['errors']}), "
+              f"next poll in {interval:.0f}s")
+        time.sleep(interval)
+
 def main():
     # Set up argument parser
     parser = argparse.ArgumentParser(description='Fetch new entries from Google Sheets')
@@ -161,8 +638,38 @@ def main():
                         help='Process all entries, including previously processed ones')
     parser.add_argument('--reset-auth', action='store_true',
                         help='Reset authentication token and re-authenticate')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Only fetch rows appended since the last run (uses the stored watermark)')
+    parser.add_argument('--stream', action='store_true',
+                        help='Read the sheet in fixed-size row windows and write markdown files as rows arrive')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                        help=f'Rows per request in --stream mode (default: {CHUNK_SIZE})')
+    parser.add_argument('--columnar', action='store_true',
+                        help='Process a full read as a pandas DataFrame with batch ID hashing (needs pandas and pyarrow)')
+    parser.add_argument('--parquet', type=str, metavar='PATH',
+                        help='Also export all fetched responses to a Parquet file (implies --columnar)')
+    parser.add_argument('--id-columns', type=lambda value: [c.strip() for c in value.split(',') if c.strip()],
+                        default=ID_COLUMNS,
+                        help=f'Comma-separated columns that identify a response (default: {",".join(ID_COLUMNS)})')
+    parser.add_argument('--migrate-ids', action='store_true',
+                        help='Convert already-processed entries to identity-column IDs and exit')
+    parser.add_argument('--read-quota', type=int, default=READ_QUOTA_PER_MINUTE,
+                        help=f'Sheets API read requests allowed per minute (default: {READ_QUOTA_PER_MINUTE})')
+    parser.add_argument('--config', type=str,
+                        help='JSON file listing the spreadsheets/ranges to ingest concurrently')
+    parser.add_argument('--watch', action='store_true',
+                        help='Stay running and poll the sheet for new rows (implies --incremental)')
+    parser.add_argument('--min-interval', type=float, default=WATCH_MIN_INTERVAL,
+                        help=f'Shortest poll interval in seconds for --watch (default: {WATCH_MIN_INTERVAL})')
+    parser.add_argument('--max-interval', type=float, default=WATCH_MAX_INTERVAL,
+                        help=f'Longest poll interval in seconds for --watch (default: {WATCH_MAX_INTERVAL})')
     args = parser.parse_args()
     
+    if args.parquet:
+        args.columnar = True
+    if args.columnar and (args.stream or args.incremental or args.watch):
+        parser.error('--columnar/--parquet work on a full read and cannot be combined with --stream, --incremental or --watch')
+    
     # Check if token exists and delete it if requested
     if args.reset_auth and os.path.exists(TOKEN_FILE):
         os.remove(TOKEN_FILE)
@@ -173,32 +680,38 @@ def main():
             os.remove(TOKEN_FILE)
             print(f"Removed {TOKEN_FILE}. You will need to authenticate again.")
     
+    configure_read_quota(args.read_quota)
+    
     try:
-        # Get sheet data
-        rows = get_sheet_data()
+        if args.config:
+            sources, max_workers = load_sources(args.config)
+            if not sources:
+                print(f"No sources listed in {args.config}.")
+                return
+        else:
+            sources, max_workers = [DEFAULT_SOURCE], 1
         
-        if not rows:
-            print("No data to process.")
-            return
+        # Open the store once up front so any migration (processed_entries.json,
+        # older schema) runs before worker threads open their own connections
+        open_store(DEFAULT_SOURCE).close()
         
-        # Get previously processed entries
-        processed_entries = get_processed_entries() if not args.force_all else []
-        new_processed_entries = processed_entries.copy()
+        if args.migrate_ids:
+            run_sources(sources, args, max_workers, task=migrate_source)
+            return
         
-        # Process new entries
-        new_entries_count = 0
+        if args.watch:
+            try:
+                watch(sources, args, max_workers)
+            except KeyboardInterrupt:
+                print("\nStopped watching.")
+            return
         
-        for row in rows:
-            entry_id = generate_entry_id(row)
-            
-            if entry_id not in processed_entries:
-                filename = create_markdown_file(row, entry_id)
-                new_processed_entries.append(entry_id)
-                new_entries_count += 1
-                print(f"Created markdown file: {filename}")
-        
-        # Save processed entries
-        save_processed_entries(new_processed_entries)
+        results = run_sources(sources, args, max_workers)
+        new_entries_count = sum(r for r in results.values() if not isinstance(r, Exception))
+        if len(sources) > 1:
+            for name, result in results.items():
+                status = f"failed ({result})" if isinstance(result, Exception) else f"{result} new entries"
+                print(f"  {name}: {status}")
         
         if new_entries_count > 0:
             print(f"Processed {new_entries_count} new entries.")
@@ -1,202 +1,368 @@
 #!/usr/bin/env python3
 import os
-import re
 import sys
+import time
+import email
 import argparse
-import smtplib
-import markdown
+from concurrent.futures import ProcessPoolExecutor
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
-from pathlib import Path
+from email.utils import make_msgid
+from smtp_transport import SMTPTransport, is_transient_error
+from dispatch import (DispatchEngine, parse_domain_rates, domain_rate_type, rate_type,
+                      DEFAULT_CONCURRENCY, DEFAULT_DOMAIN_RATE)
+from outbox import Outbox, OUTBOX_DB, MAX_ATTEMPTS, SENT
+from review_parser import parse_review, ReviewCache, PARSE_CACHE_DB
+from email_templates import EmailRenderer, TEMPLATE_DIR, DEFAULT_TEMPLATE
+from preview_sink import MboxSink, EmlDirSink
+from storage_layout import sharded_dir, entry_id_of
+from coalesce import group_reviews, coalesce, group_key, normalize_address, POLICIES, DEFAULT_POLICY
 
 # Constants
 MD_DIR = 'markdown_files'
 PROCESSED_DIR = 'processed_markdown'
-EMAIL_PATTERN = r'\*\*Email:\*\*\s*(.*)'
-SEND_EMAIL_PATTERN = r'- \[x\] Yes, send email to this respondent'
-COMMENTS_PATTERN = r'## Comments\s*(?:<!--.*?-->)?\s*(.*?)(?=\s*##|$)'
+SUBJECT = "Thank you for your feedback"
+SENDER = os.environ.get('SMTP_FROM') or os.environ.get('SMTP_USERNAME') or 'your-email@example.com'
+WORK_CHUNK = 250  # Files per work unit sent to a --workers process
+DEFAULT_LOOKBACK_DAYS = 7  # Don't email an address again within this many days
+RETRY_WAIT_LIMIT = 120  # Seconds to wait in-process for a failed send's retry; later retries wait for the next run
 
 def get_markdown_files():
-    """Get list of markdown files that haven't been processed yet."""
+    """Get paths of markdown files that haven't been processed yet, sorted by entry ID."""
     if not os.path.exists(MD_DIR):
         print(f"Directory {MD_DIR} does not exist.")
         return []
     
-    return [f for f in os.listdir(MD_DIR) if f.endswith('.md')]
+    # Listed from the directory's index instead of walking every shard
+    return sharded_dir(MD_DIR).files()
 
 def parse_markdown_file(file_path):
     """Parse markdown file to extract necessary information."""
     try:
         with open(file_path, 'r') as f:
             content = f.read()
-        
-        # Extract email
-        email_match = re.search(EMAIL_PATTERN, content, re.DOTALL)
-        email = email_match.group(1).strip() if email_match else None
-        
-        # Check if email should be sent
-        should_send = bool(re.search(SEND_EMAIL_PATTERN, content, re.DOTALL))
-        
-        # Extract comments
-        comments_match = re.search(COMMENTS_PATTERN, content, re.DOTALL)
-        comments = comments_match.group(1).strip() if comments_match else ""
-        
-        return {
-            'email': email,
-            'should_send': should_send,
-            'comments': comments,
-            'raw_content': content,
-            'file_name': os.path.basename(file_path)
-        }
+        return parse_review(content, os.path.basename(file_path))
     except Exception as e:
         print(f"Error parsing file {file_path}: {e}")
         return None
 
-def create_email_content(parsed_data):
-    """Create HTML email content from parsed markdown data."""
-    # Convert the comments to HTML
-    comments_html = markdown.markdown(parsed_data['comments'])
-    
-    # Create basic email template
-    html_content = f"""
-    <html>
-    <head>
-        <style>
-            body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-            .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-            .header {{ background-color: #f8f9fa; padding: 10px; border-bottom: 1px solid #e9ecef; }}
-            .content {{ padding: 20px 0; }}
-            .footer {{ border-top: 1px solid #e9ecef; padding-top: 15px; font-size: 0.8em; color: #6c757d; }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <div class="header">
-                <h2>Thank you for your feedback!</h2>
-            </div>
-            <div class="content">
-                <p>We appreciate your response to our form.</p>
-                
-                <div class="comments">
-                    {comments_html}
-                </div>
-                
-                <p>Please let us know if you have any questions.</p>
-            </div>
-            <div class="footer">
-                <p>This is an automated email generated based on your form submission.</p>
-            </div>
-        </div>
-    </body>
-    </html>
+def needs_email(parsed_data):
+    return bool(parsed_data and parsed_data['should_send'] and parsed_data['email'])
+
+def prepare_review(file_path, parsed_data, renderer):
+    """Parse a file unless its record is already known, and render its email if it is ready to send.
+
+    Returns (file_path, parsed_data, bodies), where bodies is (text, html) or None.
     """
-    
-    return html_content
+    if parsed_data is None:
+        parsed_data = parse_markdown_file(file_path)
+    bodies = create_email_content(parsed_data, renderer) if needs_email(parsed_data) else None
+    return file_path, parsed_data, bodies
 
-def send_email(recipient, subject, html_content, is_production):
-    """Send email to recipient (dummy implementation)."""
-    if is_production:
+# Per-process renderer for --workers; set up once by init_worker
+_worker_renderer = None
+
+def init_worker(template_dir, template):
+    global _worker_renderer
+    _worker_renderer = EmailRenderer(template_dir, template)
+
+def prepare_chunk(chunk):
+    """Work unit for a --workers process: a list of (file_path, cached record or None)."""
+    return [prepare_review(file_path, parsed_data, _worker_renderer) for file_path, parsed_data in chunk]
+
+def prepare_reviews(cache, md_files, renderer, workers=1, template_dir=TEMPLATE_DIR, template=DEFAULT_TEMPLATE):
+    """Yield (file_path, parsed_data, bodies) for every file.
+
+    Unchanged files come from the parse cache; only files that changed or
+    are ready to send are parsed and rendered. With `workers` > 1 that
+    work is spread over a process pool in chunks of WORK_CHUNK files, and
+    the results come back in file order. Files needing no work are yielded
+    first.
+    """
+    pending = []
+    stats = {}
+    for file_path in md_files:
         try:
-            # This would be the actual email sending logic
-            # Using a simple placeholder for now
-            print(f"PRODUCTION MODE: Would send email to {recipient}")
-            print(f"Subject: {subject}")
-            print("This is just a placeholder for actual email sending logic")
-            
-            # Uncomment and configure this code when ready to send real emails
-            """
-            msg = MIMEMultipart('alternative')
-            msg['Subject'] = subject
-            msg['From'] = 'your-email@example.com'
-            msg['To'] = recipient
-            
-            html_part = MIMEText(html_content, 'html')
-            msg.attach(html_part)
-            
-            with smtplib.SMTP('smtp.example.com', 587) as server:
-                server.starttls()
-                server.login('your-email@example.com', 'your-password')
-                server.send_message(msg)
-            """
-            return True
-        except Exception as e:
-            print(f"Error sending email: {e}")
-            return False
+            stat = os.stat(file_path)
+        except OSError as e:
+            print(f"Error parsing file {file_path}: {e}")
+            yield file_path, None, None
+            continue
+        
+        parsed_data = cache.get(file_path, stat)
+        if parsed_data is not None and not needs_email(parsed_data):
+            yield file_path, parsed_data, None
+            continue
+        if parsed_data is None:
+            stats[file_path] = stat
+        pending.append((file_path, parsed_data))
+    
+    if workers > 1 and len(pending) > WORK_CHUNK:
+        chunks = [pending[i:i + WORK_CHUNK] for i in range(0, len(pending), WORK_CHUNK)]
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                 initargs=(template_dir, template)) as pool:
+            results = (result for chunk in pool.map(prepare_chunk, chunks) for result in chunk)
+            yield from _cache_parsed(cache, stats, results)
     else:
-        # Just print the email details in non-production mode
-        print(f"\n{'=' * 50}")
-        print(f"PREVIEW MODE: Email to {recipient}")
-        print(f"Subject: {subject}")
-        print(f"{'=' * 50}")
-        print(html_content)
-        print(f"{'=' * 50}\n")
-        return True
+        results = (prepare_review(file_path, parsed_data, renderer) for file_path, parsed_data in pending)
+        yield from _cache_parsed(cache, stats, results)
 
-def move_to_processed(file_path, success):
-    """Move markdown file to processed directory after handling."""
-    # Create processed directory if it doesn't exist
-    os.makedirs(PROCESSED_DIR, exist_ok=True)
-    
-    # Create success and failure subdirectories
-    success_dir = os.path.join(PROCESSED_DIR, 'success')
-    failure_dir = os.path.join(PROCESSED_DIR, 'failure')
-    os.makedirs(success_dir, exist_ok=True)
-    os.makedirs(failure_dir, exist_ok=True)
+def _cache_parsed(cache, stats, results):
+    for file_path, parsed_data, bodies in results:
+        if file_path in stats and parsed_data:
+            cache.put(file_path, stats[file_path], parsed_data)
+        yield file_path, parsed_data, bodies
+
+def create_email_content(parsed_data, renderer):
+    """Create the plain-text and HTML email bodies from parsed markdown data."""
+    return renderer.render(parsed_data['comments'])
+
+def build_message(recipient, subject, html_content, sender, text_content=None, message_id=None):
+    """Build the MIME message for an email, with a plain-text alternative if given."""
+    msg = MIMEMultipart('alternative')
+    msg['Subject'] = subject
+    msg['From'] = sender
+    msg['To'] = recipient
+    # Fixed once the message is queued, so a resend after a crash carries the same ID
+    msg['Message-ID'] = message_id or make_msgid(domain=sender.rsplit('@', 1)[-1])
     
-    # Determine target directory
-    target_dir = success_dir if success else failure_dir
-    file_name = os.path.basename(file_path)
+    # Plain text first: clients show the last alternative they support
+    if text_content is not None:
+        msg.attach(MIMEText(text_content, 'plain'))
+    html_part = MIMEText(html_content, 'html')
+    msg.attach(html_part)
+    return msg
+
+def preview_email(recipient, subject, html_content):
+    """Print an email's details instead of sending it (production sends go through the outbox)."""
+    print(f"\n{'=' * 50}")
+    print(f"PREVIEW MODE: Email to {recipient}")
+    print(f"Subject: {subject}")
+    print(f"{'=' * 50}")
+    print(html_content)
+    print(f"{'=' * 50}\n")
+
+def move_to_processed(file_path, success):
+    """Move markdown file into its shard of the processed success or failure directory."""
+    # Determine target directory; shard directories are created once per run
+    target_dir = os.path.join(PROCESSED_DIR, 'success' if success else 'failure')
+    entry_id = entry_id_of(file_path)
     
     # Move the file
     try:
-        os.rename(file_path, os.path.join(target_dir, file_name))
-        print(f"Moved {file_name} to {target_dir}")
+        target = sharded_dir(target_dir).add_file(file_path, entry_id)
+        sharded_dir(MD_DIR).forget(entry_id)
+        print(f"Moved {os.path.basename(file_path)} to {os.path.dirname(target)}")
     except Exception as e:
         print(f"Error moving file {file_path}: {e}")
 
+def outbox_key(file_paths):
+    """Idempotency key for an email: its entry ID, or a digest of them for a coalesced email."""
+    return group_key([entry_id_of(file_path) for file_path in file_paths])
+
+def move_all_to_processed(file_paths, success):
+    for file_path in file_paths:
+        move_to_processed(file_path, success)
+
+def recently_emailed(lookback_days):
+    """Normalized addresses emailed within the last `lookback_days`, according to the outbox."""
+    if lookback_days <= 0 or not os.path.exists(OUTBOX_DB):
+        return set()
+    with Outbox(OUTBOX_DB) as outbox:
+        since = time.time() - lookback_days * 86400
+        return {normalize_address(recipient) for recipient in outbox.sent_recipients(since)}
+
+def claim_jobs(outbox, keys):
+    """Mark each due message as sending just before it is handed to the engine."""
+    for key in keys:
+        row = outbox.claim(key)
+        yield key, row['recipient'], email.message_from_bytes(row['body'])
+
+def send_from_outbox(outbox, engine):
+    """Send every due message in the outbox, retrying failures with backoff.
+
+    Failed sends that are due again within RETRY_WAIT_LIMIT are retried in
+    this run; anything later is left in the outbox for the next run. Review
+    files are only moved once the outbox records a final result.
+    """
+    while True:
+        keys = outbox.due_keys()
+        if not keys:
+            next_due = outbox.next_due_time()
+            if next_due is None or next_due - time.time() > RETRY_WAIT_LIMIT:
+                return
+            time.sleep(max(0, next_due - time.time()))
+            continue
+        
+        for key, success, error in engine.run(claim_jobs(outbox, keys)):
+            record_result(outbox, key, success, error)
+
+def record_result(outbox, key, success, error):
+    """Record a send result in the outbox and file the email's review files once it is final."""
+    source_files = []
+    for source_file in (outbox.get(key)['source_file'] or '').splitlines():
+        if not os.path.exists(source_file):
+            # The file may have been moved by a storage migration since it was queued
+            source_file = sharded_dir(MD_DIR).locate(entry_id_of(source_file))
+        if source_file:
+            source_files.append(source_file)
+    if success:
+        outbox.mark_sent(key)
+        print(f"Sent email for {key}")
+    elif outbox.mark_failed(key, error, retryable=is_transient_error(error)):
+        print(f"Error sending email for {key} (will retry): {error}")
+        return
+    else:
+        print(f"Error sending email for {key}: {error}")
+    
+    # Move files to processed directory
+    move_all_to_processed(source_files, success)
+
 def main():
     parser = argparse.ArgumentParser(description='Generate emails from markdown files')
     parser.add_argument('--production', action='store_true', 
                         help='Send actual emails instead of just previewing')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help=f'Number of emails sent in parallel in production mode (default: {DEFAULT_CONCURRENCY})')
+    parser.add_argument('--domain-rate', action='append', type=domain_rate_type, metavar='DOMAIN=PER_MINUTE',
+                        help='Per-minute send limit for a recipient domain, e.g. gmail.com=60 (repeatable)')
+    parser.add_argument('--default-rate', type=rate_type, default=DEFAULT_DOMAIN_RATE,
+                        help=f'Per-minute send limit for domains without their own limit (default: {DEFAULT_DOMAIN_RATE})')
+    parser.add_argument('--template', type=str, default=DEFAULT_TEMPLATE,
+                        help=f'Name of the email template (<name>.html and optional <name>.txt) (default: {DEFAULT_TEMPLATE})')
+    parser.add_argument('--template-dir', type=str, default=TEMPLATE_DIR,
+                        help='Directory containing the email templates (default: templates/ next to this script)')
+    parser.add_argument('--preview-mbox', type=str, metavar='FILE',
+                        help='In preview mode, write all emails to this mbox file (plus an HTML index) instead of printing them')
+    parser.add_argument('--preview-dir', type=str, metavar='DIR',
+                        help='In preview mode, write each email to DIR/<entry>.eml (plus DIR/index.html) instead of printing them')
+    parser.add_argument('--coalesce', type=str, choices=POLICIES, default=DEFAULT_POLICY,
+                        help='How to handle several reviews for the same address: merge their comments into one email, '
+                             f'send only the latest review, or send them separately (default: {DEFAULT_POLICY})')
+    parser.add_argument('--lookback-days', type=float, default=DEFAULT_LOOKBACK_DAYS,
+                        help=f'Skip addresses already emailed within this many days; 0 disables (default: {DEFAULT_LOOKBACK_DAYS})')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Processes used to parse and render review files (default: 1). Helps with large batches')
+    parser.add_argument('--max-attempts', type=int, default=MAX_ATTEMPTS,
+                        help=f'Send attempts per email before it is given up on (default: {MAX_ATTEMPTS})')
     args = parser.parse_args()
+    if args.preview_mbox and args.preview_dir:
+        parser.error('Use only one of --preview-mbox and --preview-dir')
+    
+    if args.production and SMTPTransport.from_env() is None:
+        print("Error: SMTP_HOST is not set. Configure SMTP_HOST, SMTP_PORT, SMTP_USERNAME,")
+        print("SMTP_PASSWORD and SMTP_FROM before running with --production.")
+        sys.exit(1)
     
     # Get all markdown files
     md_files = get_markdown_files()
     if not md_files:
         print("No markdown files found to process.")
-        return
+        if not args.production:
+            return
+        # Still retry anything left in the outbox by earlier runs
     
-    # Process each file
-    for file_name in md_files:
-        file_path = os.path.join(MD_DIR, file_name)
-        parsed_data = parse_markdown_file(file_path)
-        
-        if not parsed_data:
-            print(f"Skipping {file_name} due to parsing error.")
-            continue
-        
-        if not parsed_data['should_send']:
-            print(f"Skipping {file_name} - not marked for sending.")
-            continue
-        
-        if not parsed_data['email']:
-            print(f"Skipping {file_name} - no email address found.")
-            continue
-        
-        # Generate email content
-        html_content = create_email_content(parsed_data)
-        
-        # Send email
-        subject = "Thank you for your feedback"
-        success = send_email(
-            parsed_data['email'], 
-            subject, 
-            html_content, 
-            args.production
-        )
+    # Templates are compiled once; identical comments are rendered once
+    renderer = EmailRenderer(args.template_dir, args.template)
+    
+    # Parse and render every file that is ready to send; unchanged files come from the cache
+    ready = []
+    not_marked = 0
+    with ReviewCache(PARSE_CACHE_DB) as cache:
+        reviews = prepare_reviews(cache, md_files, renderer, args.workers, args.template_dir, args.template)
+        for file_path, parsed_data, bodies in reviews:
+            file_name = os.path.basename(file_path)
+            
+            if not parsed_data:
+                print(f"Skipping {file_name} due to parsing error.")
+                continue
+            
+            if not parsed_data['should_send']:
+                not_marked += 1
+                continue
+            
+            if not parsed_data['email']:
+                print(f"Skipping {file_name} - no email address found.")
+                continue
+            
+            ready.append((file_path, parsed_data, bodies))
         
-        # Move file to processed directory
-        move_to_processed(file_path, success)
+        cache.prune(md_files)
+    
+    if not_marked:
+        print(f"Skipping {not_marked} file(s) not marked for sending "
+              f"({cache.hits} of {cache.hits + cache.misses} files unchanged since the last run).")
+    
+    # One email per recipient address according to --coalesce
+    emails = coalesce(group_reviews(ready), args.coalesce, renderer)
+    if len(emails) < len(ready):
+        print(f"Coalesced {len(ready)} reviews into {len(emails)} emails ({args.coalesce}).")
+    
+    # Previews written to an mbox or .eml directory leave the review files where they are
+    keep_files = not args.production and bool(args.preview_mbox or args.preview_dir)
+    
+    # Addresses emailed recently are thanked already; their reviews are filed as handled
+    recent = recently_emailed(args.lookback_days)
+    if recent:
+        pending_emails = []
+        for file_paths, recipient, text_content, html_content in emails:
+            if normalize_address(recipient) in recent:
+                print(f"Skipping {recipient} - already emailed in the last {args.lookback_days:g} days.")
+                if not keep_files:
+                    move_all_to_processed(file_paths, True)
+            else:
+                pending_emails.append((file_paths, recipient, text_content, html_content))
+        emails = pending_emails
+    
+    if args.production:
+        with Outbox(OUTBOX_DB, max_attempts=args.max_attempts) as outbox:
+            recovered = outbox.recover_stale()
+            if recovered:
+                print(f"Requeued {recovered} email(s) left mid-send by an earlier run.")
+            
+            # Queue new emails; files whose email was already sent are only moved
+            for file_paths, recipient, text_content, html_content in emails:
+                key = outbox_key(file_paths)
+                status = outbox.status(key)
+                if status is None:
+                    msg = build_message(recipient, SUBJECT, html_content, SENDER, text_content)
+                    status = outbox.enqueue(key, recipient, SUBJECT, msg.as_bytes(), '\n'.join(file_paths))
+                elif outbox.is_given_up(key):
+                    # The files were moved back for another try after their email was given up on
+                    msg = build_message(recipient, SUBJECT, html_content, SENDER, text_content)
+                    status = outbox.requeue(key, recipient, SUBJECT, msg.as_bytes(), '\n'.join(file_paths))
+                if status == SENT:
+                    print(f"Email for {key} was already sent.")
+                    move_all_to_processed(file_paths, True)
+            
+            # Send concurrently; each worker reuses its own SMTP connection
+            engine = DispatchEngine(
+                SMTPTransport.from_env,
+                concurrency=args.concurrency,
+                domain_rates=parse_domain_rates(args.domain_rate),
+                default_rate=args.default_rate)
+            send_from_outbox(outbox, engine)
+            
+            engine.print_report()
+            counts = outbox.counts()
+            print("Outbox: " + ", ".join(f"{count} {status}" for status, count in sorted(counts.items())))
+    elif args.preview_mbox or args.preview_dir:
+        sink = MboxSink(args.preview_mbox) if args.preview_mbox else EmlDirSink(args.preview_dir)
+        with sink:
+            for file_paths, recipient, text_content, html_content in emails:
+                key = outbox_key(file_paths)
+                # A fixed Message-ID and boundary keep previews of the same batch identical between runs
+                msg = build_message(recipient, SUBJECT, html_content, SENDER, text_content,
+                                    message_id=f'<{key}@preview.invalid>')
+                msg.set_boundary(f'===============preview-{key}==')
+                sink.add(key, msg, ', '.join(file_paths))
+        print(f"Wrote {len(sink.rows)} email preview(s); open {sink.index_path} to browse them.")
+    else:
+        for file_paths, recipient, text_content, html_content in emails:
+            preview_email(recipient, SUBJECT, html_content)
+            
+            # Move files to processed directory
+            move_all_to_processed(file_paths, True)
     
     print("Email generation process completed.")
 
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+import sqlite3
+import time
+
+# Constants
+OUTBOX_DB = 'outbox.db'
+MAX_ATTEMPTS = 5
+RETRY_BASE_DELAY = 5  # Seconds before the first retry; doubles with each attempt
+SENDING_LEASE = 300  # Seconds after which a 'sending' row is assumed orphaned by a crash
+CLAIM_BATCH = 500  # Due messages fetched per query
+BUSY_TIMEOUT = 30  # Seconds to wait for another connection's write lock
+
+QUEUED = 'queued'
+SENDING = 'sending'
+SENT = 'sent'
+FAILED = 'failed'
+
+class Outbox:
+    """Durable, SQLite-backed send queue keyed by an idempotency key.
+
+    Each message moves queued -> sending -> sent, or -> failed. The state is
+    committed before a message is handed to SMTP and again as soon as the
+    result is known, so a crashed run can be resumed without emailing anyone
+    twice. A message whose key is already recorded is never enqueued again.
+    Failed messages are retried with exponential backoff until
+    `max_attempts` is reached.
+    """
+
+    def __init__(self, db_path=OUTBOX_DB, max_attempts=MAX_ATTEMPTS):
+        self.db_path = db_path
+        self.max_attempts = max_attempts
+        self.conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS messages (
+                key TEXT PRIMARY KEY,
+                recipient TEXT NOT NULL,
+                subject TEXT,
+                body BLOB NOT NULL,
+                source_file TEXT,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                last_error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                sent_at REAL
+            )
+        """)
+        self.conn.execute(
+            'CREATE INDEX IF NOT EXISTS messages_due ON messages (status, next_attempt_at)')
+        self.conn.commit()
+
+    def get(self, key):
+        """Return the row for a key as a dict, or None."""
+        row = self.conn.execute('SELECT * FROM messages WHERE key = ?', (key,)).fetchone()
+        return dict(row) if row else None
+
+    def status(self, key):
+        row = self.conn.execute('SELECT status FROM messages WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def enqueue(self, key, recipient, subject, body, source_file=None):
+        """Queue a serialized message unless its key is already known. Returns its status.
+
+        `source_file` is the review file behind the message, or several
+        paths, one per line, for a coalesced message.
+        """
+        now = time.time()
+        with self.conn:
+            self.conn.execute(
+                'INSERT OR IGNORE INTO messages '
+                '(key, recipient, subject, body, source_file, status, next_attempt_at, created_at, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, recipient, subject, body, source_file, QUEUED, now, now, now))
+        return self.status(key)
+
+    def requeue(self, key, recipient, subject, body, source_file=None):
+        """Replace a given-up message with a fresh copy and queue it again."""
+        now = time.time()
+        with self.conn:
+            self.conn.execute(
+                'UPDATE messages SET recipient = ?, subject = ?, body = ?, source_file = ?, status = ?, '
+                'attempts = 0, next_attempt_at = ?, last_error = NULL, updated_at = ? WHERE key = ?',
+                (recipient, subject, body, source_file, QUEUED, now, now, key))
+        return QUEUED
+
+    def is_given_up(self, key):
+        """True if the message failed and will not be retried again."""
+        row = self.conn.execute('SELECT status, attempts FROM messages WHERE key = ?', (key,)).fetchone()
+        return bool(row) and row[0] == FAILED and row[1] >= self.max_attempts
+
+    def recover_stale(self, lease=SENDING_LEASE):
+        """Requeue messages left in 'sending' by a run that crashed. Returns how many.
+
+        Such a message may or may not have reached the server. Its stored
+        bytes (and so its Message-ID) are reused, which lets mail clients
+        drop a duplicate.
+        """
+        with self.conn:
+            cursor = self.conn.execute(
+                'UPDATE messages SET status = ?, updated_at = ? WHERE status = ? AND updated_at < ?',
+                (QUEUED, time.time(), SENDING, time.time() - lease))
+        return cursor.rowcount
+
+    def due_keys(self, limit=CLAIM_BATCH):
+        """Keys of queued or retryable failed messages whose retry time has come."""
+        rows = self.conn.execute(
+            'SELECT key FROM messages WHERE status IN (?, ?) AND attempts < ? AND next_attempt_at <= ? '
+            'ORDER BY next_attempt_at LIMIT ?',
+            (QUEUED, FAILED, self.max_attempts, time.time(), limit))
+        return [row[0] for row in rows]
+
+    def next_due_time(self):
+        """Earliest time a retryable message becomes due, or None."""
+        row = self.conn.execute(
+            'SELECT MIN(next_attempt_at) FROM messages WHERE status IN (?, ?) AND attempts < ?',
+            (QUEUED, FAILED, self.max_attempts)).fetchone()
+        return row[0]
+
+    def claim(self, key):
+        """Mark a message as sending (durably) and return its row."""
+        with self.conn:
+            self.conn.execute(
+                'UPDATE messages SET status = ?, attempts = attempts + 1, updated_at = ? WHERE key = ?',
+                (SENDING, time.time(), key))
+        return self.get(key)
+
+    def mark_sent(self, key):
+        now = time.time()
+        with self.conn:
+            self.conn.execute(
+                'UPDATE messages SET status = ?, last_error = NULL, updated_at = ?, sent_at = ? WHERE key = ?',
+                (SENT, now, now, key))
+
+    def mark_failed(self, key, error, retryable=True):
+        """Record a failed attempt. Returns True if the message will be retried."""
+        row = self.get(key)
+        attempts = row['attempts'] if row else self.max_attempts
+        will_retry = retryable and attempts < self.max_attempts
+        next_attempt_at = time.time() + RETRY_BASE_DELAY * 2 ** max(0, attempts - 1)
+        with self.conn:
+            self.conn.execute(
+                'UPDATE messages SET status = ?, last_error = ?, next_attempt_at = ?, '
+                'attempts = CASE WHEN ? THEN attempts ELSE ? END, updated_at = ? WHERE key = ?',
+                (FAILED, str(error), next_attempt_at, will_retry, self.max_attempts, time.time(), key))
+        return will_retry
+
+    def sent_recipients(self, since):
+        """Recipients of messages sent at or after `since` (a Unix time)."""
+        rows = self.conn.execute(
+            'SELECT DISTINCT recipient FROM messages WHERE status = ? AND sent_at >= ?', (SENT, since))
+        return [row[0] for row in rows]
+
+    def counts(self):
+        """Number of messages in each status."""
+        rows = self.conn.execute('SELECT status, COUNT(*) FROM messages GROUP BY status')
+        return {status: count for status, count in rows}
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
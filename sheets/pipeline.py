@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+import sys
+import time
+import email
+import queue
+import argparse
+import threading
+
+import fetch_new_entries as fetch
+import generate_emails as emails
+from sheets_client import configure_read_quota, READ_QUOTA_PER_MINUTE
+from dispatch import (DispatchEngine, parse_domain_rates, domain_rate_type, rate_type,
+                      DEFAULT_CONCURRENCY, DEFAULT_DOMAIN_RATE)
+from smtp_transport import SMTPTransport
+from outbox import Outbox, OUTBOX_DB, MAX_ATTEMPTS, QUEUED, SENT
+from review_parser import ReviewCache, PARSE_CACHE_DB
+from email_templates import EmailRenderer, TEMPLATE_DIR, DEFAULT_TEMPLATE
+from preview_sink import MboxSink
+from coalesce import group_reviews, coalesce, normalize_address, POLICIES, DEFAULT_POLICY
+
+# Constants
+QUEUE_SIZE = 1000  # Items buffered between two stages
+DEFAULT_PREVIEW_MBOX = 'pipeline_preview.mbox'
+NO_EMAIL = 'No Email'
+DONE = object()  # End-of-stream marker passed down the queues
+POLL_INTERVAL = 0.5  # Seconds between checks for a failed stage while blocked on a queue
+
+class PipelineAborted(Exception):
+    """Raised inside a stage when another stage has failed, to unwind it."""
+
+def wait_get(inbox, failed):
+    """Take the next item from `inbox`, or DONE once another stage has failed."""
+    while True:
+        try:
+            return inbox.get(timeout=POLL_INTERVAL)
+        except queue.Empty:
+            if failed.is_set():
+                return DONE
+
+def wait_put(outbox, item, failed):
+    """Put `item` on `outbox`; raise PipelineAborted if a stage fails while it is full."""
+    while True:
+        try:
+            outbox.put(item, timeout=POLL_INTERVAL)
+            return
+        except queue.Full:
+            if failed.is_set():
+                raise PipelineAborted()
+
+class StageStats:
+    """Item counts and timings of one pipeline stage."""
+
+    def __init__(self, name):
+        self.name = name
+        self.items_in = 0
+        self.items_out = 0
+        self.waiting = 0.0  # Seconds blocked on an empty inbox or a full outbox
+        self.started = None
+        self.finished = None
+
+    @property
+    def seconds(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def busy(self):
+        return max(0.0, self.seconds - self.waiting)
+
+class Stage(threading.Thread):
+    """Runs `func(stage)` on its own thread, reading from and writing to bounded queues.
+
+    `func` iterates `stage.items()` and calls `stage.emit(item)`. When it
+    returns DONE is passed on, so the stages downstream finish too. If it
+    fails, the error is kept in `self.error` and the shared `failed` event
+    is set, which makes every other stage stop instead of blocking forever
+    on a queue nobody reads any more.
+    """
+
+    def __init__(self, name, func, failed, inbox=None, queue_size=QUEUE_SIZE):
+        super().__init__(name=f'pipeline-{name}', daemon=True)
+        self.func = func
+        self.failed = failed
+        self.inbox = inbox
+        self.outbox = queue.Queue(maxsize=queue_size)
+        self.stats = StageStats(name)
+        self.error = None
+
+    def items(self):
+        while True:
+            start = time.perf_counter()
+            item = wait_get(self.inbox, self.failed)
+            self.stats.waiting += time.perf_counter() - start
+            if item is DONE:
+                return
+            self.stats.items_in += 1
+            yield item
+
+    def emit(self, item):
+        start = time.perf_counter()
+        wait_put(self.outbox, item, self.failed)
+        self.stats.waiting += time.perf_counter() - start
+        self.stats.items_out += 1
+
+    def run(self):
+        self.stats.started = time.perf_counter()
+        try:
+            self.func(self)
+        except PipelineAborted:
+            pass
+        except BaseException as e:
+            self.error = e
+            self.failed.set()
+        finally:
+            self.stats.finished = time.perf_counter()
+            try:
+                wait_put(self.outbox, DONE, self.failed)
+            except PipelineAborted:
+                pass
+
+def fetch_stage(sources, args):
+    """Stream every source's rows, then a watermark marker for the source."""
+    def run(stage):
+        for source in sources:
+            watermark = None
+            if args.incremental and not args.force_all:
+                with fetch.open_store(source, read_only=True) as processed_entries:
+                    watermark = processed_entries.get_watermark(fetch.source_key(source))
+            rows = fetch.SheetRowStream(watermark, args.chunk_size, source)
+            for row in rows:
+                stage.emit(('row', source, row))
+            stage.emit(('watermark', source, rows.watermark))
+    return run
+
+def dedup_stage(args):
+    """Compute entry IDs and pass on only rows not yet processed.
+
+    The stores are opened read-only: this stage only looks IDs up, and the
+    send stage's connection does every write, so the two never wait on
+    each other's write lock.
+    """
+    def run(stage):
+        stores = {}
+        id_functions = {}
+        try:
+            for item in stage.items():
+                kind, source = item[0], item[1]
+                if kind != 'row':
+                    stage.emit(item)
+                    continue
+                key = fetch.source_key(source)
+                if key not in stores:
+                    stores[key] = fetch.open_store(source, read_only=True)
+                    id_functions[key] = fetch.entry_id_function(stores[key], args, source)
+                entry_id = id_functions[key](item[2])
+                if args.force_all or entry_id not in stores[key]:
+                    stage.emit(('entry', source, entry_id, item[2]))
+        finally:
+            for store in stores.values():
+                store.close()
+    return run
+
+def review_stage(args):
+    """Turn entries into emails or review files, after the already approved review files.
+
+    Review files that a reviewer has marked for sending are emitted first
+    (coalesced per recipient). New entries are emailed straight away with
+    --auto-send; unless --no-markdown is given, a review file is written
+    for them too. Everything else is passed on to be recorded as processed.
+    """
+    def run(stage):
+        renderer = EmailRenderer(args.template_dir, args.template)
+
+        md_files = emails.get_markdown_files()
+        if md_files:
+            with ReviewCache(PARSE_CACHE_DB, read_only=not args.production) as cache:
+                ready = [(file_path, parsed_data, bodies)
+                         for file_path, parsed_data, bodies in emails.prepare_reviews(cache, md_files, renderer)
+                         if emails.needs_email(parsed_data)]
+            for file_paths, recipient, text, html in coalesce(group_reviews(ready), args.coalesce, renderer):
+                stage.emit(('email', None, None, file_paths, recipient, text, html))
+
+        for item in stage.items():
+            if item[0] != 'entry':
+                stage.emit(item)
+                continue
+            _, source, entry_id, row = item
+            file_paths = []
+            if args.markdown and args.production:
+                file_paths = [fetch.create_markdown_file(row, entry_id, source.get('output_dir', fetch.OUTPUT_DIR))]
+            recipient = (row.get('Email Address') or '').strip()
+            if args.auto_send and recipient and recipient != NO_EMAIL:
+                text, html = renderer.render(args.comment)
+                stage.emit(('email', source, entry_id, file_paths, recipient, text, html))
+            else:
+                stage.emit(('record', source, entry_id))
+    return run
+
+class SendStage:
+    """Final stage, on the main thread: queue emails in the outbox and dispatch them as they arrive.
+
+    Entries are recorded as processed only after their email is queued (or
+    their review file written), and a source's watermark only after all of
+    its entries, so an interrupted run is picked up again by the next one.
+    Without --production, emails go to an mbox preview and nothing is
+    recorded or moved. The other stages only ever open the processed
+    entries store read-only.
+    """
+
+    def __init__(self, args, inbox, failed):
+        self.args = args
+        self.inbox = inbox
+        self.failed = failed
+        self.stats = StageStats('send')
+        self.stores = {}
+        self.recent = emails.recently_emailed(args.lookback_days)
+        self.suppressed = 0
+
+    def items(self):
+        while True:
+            start = time.perf_counter()
+            item = wait_get(self.inbox, self.failed)
+            self.stats.waiting += time.perf_counter() - start
+            if item is DONE:
+                return
+            self.stats.items_in += 1
+            yield item
+
+    def store(self, source):
+        key = fetch.source_key(source)
+        if key not in self.stores:
+            self.stores[key] = fetch.open_store(source)
+        return self.stores[key]
+
+    def jobs(self, outbox):
+        """Yield dispatch jobs for emails as they arrive, recording everything else on the way."""
+        for item in self.items():
+            kind, source = item[0], item[1]
+            if kind == 'record':
+                self.store(source).add(item[2])
+            elif kind == 'watermark':
+                if item[2]:
+                    self.store(source).set_watermark(fetch.source_key(source), **item[2])
+                self.store(source).commit()
+            elif kind == 'email':
+                _, source, entry_id, file_paths, recipient, text, html = item
+                if normalize_address(recipient) in self.recent:
+                    self.suppressed += 1
+                    emails.move_all_to_processed(file_paths, True)
+                    if source:
+                        self.store(source).add(entry_id)
+                    continue
+
+                key = entry_id or emails.outbox_key(file_paths)
+                status = outbox.status(key)
+                if status is None or outbox.is_given_up(key):
+                    msg = emails.build_message(recipient, emails.SUBJECT, html, emails.SENDER, text)
+                    if status is None:
+                        status = outbox.enqueue(key, recipient, emails.SUBJECT, msg.as_bytes(), '\n'.join(file_paths))
+                    else:
+                        status = outbox.requeue(key, recipient, emails.SUBJECT, msg.as_bytes(), '\n'.join(file_paths))
+                if source:
+                    self.store(source).add(entry_id)
+
+                if status == SENT:
+                    emails.move_all_to_processed(file_paths, True)
+                elif status == QUEUED:
+                    row = outbox.claim(key)
+                    self.stats.items_out += 1
+                    yield key, recipient, email.message_from_bytes(row['body'])
+
+    def run_production(self):
+        args = self.args
+        engine = DispatchEngine(
+            SMTPTransport.from_env,
+            concurrency=args.concurrency,
+            domain_rates=parse_domain_rates(args.domain_rate),
+            default_rate=args.default_rate)
+        with Outbox(OUTBOX_DB, max_attempts=args.max_attempts) as outbox:
+            recovered = outbox.recover_stale()
+            if recovered:
+                print(f"Requeued {recovered} email(s) left mid-send by an earlier run.")
+            for key, success, error in engine.run(self.jobs(outbox)):
+                emails.record_result(outbox, key, success, error)
+
+            # Retries, and anything queued by earlier runs; a failed run leaves them for the next one
+            if not self.failed.is_set():
+                emails.send_from_outbox(outbox, engine)
+        return engine
+
+    def run_preview(self):
+        with MboxSink(self.args.preview_mbox) as sink:
+            for item in self.items():
+                if item[0] != 'email':
+                    continue
+                _, source, entry_id, file_paths, recipient, text, html = item
+                if normalize_address(recipient) in self.recent:
+                    self.suppressed += 1
+                    continue
+                key = entry_id or emails.outbox_key(file_paths)
+                msg = emails.build_message(recipient, emails.SUBJECT, html, emails.SENDER, text,
+                                           message_id=f'<{key}@preview.invalid>')
+                msg.set_boundary(f'===============preview-{key}==')
+                sink.add(key, msg, ', '.join(file_paths))
+                self.stats.items_out += 1
+        return sink
+
+    def run(self):
+        self.stats.started = time.perf_counter()
+        try:
+            return self.run_production() if self.args.production else self.run_preview()
+        except BaseException:
+            self.failed.set()
+            raise
+        finally:
+            self.stats.finished = time.perf_counter()
+            for store in self.stores.values():
+                store.close()
+
+def print_stage_report(stats):
+    print(f"\n{'stage':<10}{'in':>9}{'out':>9}{'seconds':>10}{'busy %':>9}{'items/s':>10}")
+    for s in stats:
+        # The first stage has no inbox, so its rate is measured on what it produced
+        rate = (s.items_in or s.items_out) / s.busy if s.busy else 0.0
+        busy_pct = 100 * s.busy / s.seconds if s.seconds else 0.0
+        print(f"{s.name:<10}{s.items_in:>9}{s.items_out:>9}{s.seconds:>10.2f}{busy_pct:>9.0f}{rate:>10.0f}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Fetch new responses, look up review state and send emails in one process')
+    parser.add_argument('--production', action='store_true',
+                        help='Send emails and record progress; otherwise write an mbox preview and record nothing')
+    parser.add_argument('--auto-send', action='store_true',
+                        help='Email every new respondent straight away instead of waiting for a review')
+    parser.add_argument('--comment', type=str, default='',
+                        help='Comments (markdown) used in emails sent with --auto-send')
+    parser.add_argument('--no-markdown', dest='markdown', action='store_false',
+                        help='With --auto-send, do not write review markdown files for new entries')
+    parser.add_argument('--preview-mbox', type=str, default=DEFAULT_PREVIEW_MBOX, metavar='FILE',
+                        help=f'Where previews go without --production (default: {DEFAULT_PREVIEW_MBOX})')
+    parser.add_argument('--config', type=str,
+                        help='JSON file listing the spreadsheets/ranges to ingest')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Only fetch rows appended since the last run (uses the stored watermark)')
+    parser.add_argument('--force-all', action='store_true',
+                        help='Process all entries, including previously processed ones')
+    parser.add_argument('--chunk-size', type=int, default=fetch.CHUNK_SIZE,
+                        help=f'Rows per Sheets API request (default: {fetch.CHUNK_SIZE})')
+    parser.add_argument('--id-columns', type=lambda value: [c.strip() for c in value.split(',') if c.strip()],
+                        default=fetch.ID_COLUMNS,
+                        help=f'Comma-separated columns that identify a response (default: {",".join(fetch.ID_COLUMNS)})')
+    parser.add_argument('--read-quota', type=int, default=READ_QUOTA_PER_MINUTE,
+                        help=f'Sheets API read requests allowed per minute (default: {READ_QUOTA_PER_MINUTE})')
+    parser.add_argument('--coalesce', type=str, choices=POLICIES, default=DEFAULT_POLICY,
+                        help=f'How reviewed files for the same address are combined (default: {DEFAULT_POLICY})')
+    parser.add_argument('--lookback-days', type=float, default=emails.DEFAULT_LOOKBACK_DAYS,
+                        help=f'Skip addresses already emailed within this many days; 0 disables (default: {emails.DEFAULT_LOOKBACK_DAYS})')
+    parser.add_argument('--template', type=str, default=DEFAULT_TEMPLATE,
+                        help=f'Name of the email template (default: {DEFAULT_TEMPLATE})')
+    parser.add_argument('--template-dir', type=str, default=TEMPLATE_DIR,
+                        help='Directory containing the email templates')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help=f'Number of emails sent in parallel (default: {DEFAULT_CONCURRENCY})')
+    parser.add_argument('--domain-rate', action='append', type=domain_rate_type, metavar='DOMAIN=PER_MINUTE',
+                        help='Per-minute send limit for a recipient domain (repeatable)')
+    parser.add_argument('--default-rate', type=rate_type, default=DEFAULT_DOMAIN_RATE,
+                        help=f'Per-minute send limit for other domains (default: {DEFAULT_DOMAIN_RATE})')
+    parser.add_argument('--max-attempts', type=int, default=MAX_ATTEMPTS,
+                        help=f'Send attempts per email before it is given up on (default: {MAX_ATTEMPTS})')
+    parser.add_argument('--queue-size', type=int, default=QUEUE_SIZE,
+                        help=f'Items buffered between stages (default: {QUEUE_SIZE})')
+    args = parser.parse_args()
+
+    if not args.markdown and not args.auto_send:
+        parser.error('--no-markdown needs --auto-send; without review files new entries could never be approved')
+    if args.production and SMTPTransport.from_env() is None:
+        print("Error: SMTP_HOST is not set. Configure SMTP_HOST, SMTP_PORT, SMTP_USERNAME,")
+        print("SMTP_PASSWORD and SMTP_FROM before running with --production.")
+        sys.exit(1)
+
+    configure_read_quota(args.read_quota)
+    if args.config:
+        sources, _ = fetch.load_sources(args.config)
+    else:
+        sources = [fetch.DEFAULT_SOURCE]
+
+    # Run any store migration and settle each source's entry ID scheme before
+    # the stages take their read-only copies of the store
+    if args.production:
+        fetch.open_store(fetch.DEFAULT_SOURCE).close()
+        for source in sources:
+            fetch.open_store(source).close()
+
+    failed = threading.Event()
+    fetcher = Stage('fetch', fetch_stage(sources, args), failed, queue_size=args.queue_size)
+    dedup = Stage('dedup', dedup_stage(args), failed, fetcher.outbox, queue_size=args.queue_size)
+    review = Stage('review', review_stage(args), failed, dedup.outbox, queue_size=args.queue_size)
+    sender = SendStage(args, review.outbox, failed)
+    stages = [fetcher, dedup, review]
+    for stage in stages:
+        stage.start()
+
+    try:
+        result = sender.run()
+    except Exception as e:
+        result = None
+        print(f"Error in pipeline stage send: {e}")
+    for stage in stages:
+        stage.join()
+
+    print_stage_report([stage.stats for stage in stages] + [sender.stats])
+    if failed.is_set():
+        for stage in stages:
+            if stage.error:
+                print(f"Error in pipeline stage {stage.stats.name}: {stage.error}")
+        print("Pipeline stopped early; entries not yet recorded will be picked up by the next run.")
+        sys.exit(1)
+    if sender.suppressed:
+        print(f"Skipped {sender.suppressed} email(s) to addresses emailed in the last {args.lookback_days:g} days.")
+    if args.production:
+        result.print_report()
+    else:
+        print(f"Wrote {len(result.rows)} email preview(s) to {args.preview_mbox}; open {result.index_path} to browse them.")
+
+if __name__ == "__main__":
+    main()
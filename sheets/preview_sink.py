@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+import os
+import html
+from abc import ABC, abstractmethod
+from email.generator import BytesGenerator
+
+# Constants
+WRITE_BUFFER = 1024 * 1024  # Bytes buffered before each write to disk
+INDEX_FILE = 'index.html'
+SNIPPET_LENGTH = 160
+# Fixed From_ line so the same batch produces the same mbox on every run
+MBOX_FROM_LINE = b'From preview@localhost Thu Jan  1 00:00:00 1970\n'
+
+def part_text(msg, content_type):
+    """Return the decoded body of the first part with `content_type`, or None."""
+    for part in msg.walk():
+        if part.get_content_type() == content_type:
+            payload = part.get_payload(decode=True) or b''
+            return payload.decode(part.get_content_charset() or 'utf-8', errors='replace')
+    return None
+
+def message_text(msg):
+    """Return the plain-text body of a message, falling back to its HTML."""
+    text = part_text(msg, 'text/plain')
+    if text is None:
+        text = part_text(msg, 'text/html')
+    return text or ''
+
+class PreviewSink(ABC):
+    """Base class for preview writers: collects index rows and writes the HTML index on close."""
+
+    def __init__(self, index_path):
+        self.index_path = index_path
+        self.rows = []
+        os.makedirs(os.path.dirname(os.path.abspath(index_path)), exist_ok=True)
+
+    @abstractmethod
+    def add(self, key, msg, source_file=None):
+        """Write one message to the preview and record it in the index."""
+
+    def _record(self, key, msg, source_file, link):
+        snippet = ' '.join(message_text(msg).split())[:SNIPPET_LENGTH]
+        self.rows.append((key, msg['To'] or '', msg['Subject'] or '', source_file or '', link, snippet))
+
+    def write_index(self):
+        with open(self.index_path, 'w', buffering=WRITE_BUFFER) as f:
+            f.write('<!DOCTYPE html>\n<html>\n<head>\n<meta charset="utf-8">\n'
+                    '<title>Email preview</title>\n<style>\n'
+                    'body { font-family: Arial, sans-serif; font-size: 14px; }\n'
+                    'table { border-collapse: collapse; }\n'
+                    'td, th { border: 1px solid #e9ecef; padding: 4px 8px; text-align: left; vertical-align: top; }\n'
+                    '</style>\n</head>\n<body>\n')
+            f.write(f'<h2>{len(self.rows)} email(s)</h2>\n<table>\n'
+                    '<tr><th>#</th><th>To</th><th>Subject</th><th>Review file</th><th>Preview</th></tr>\n')
+            for number, (key, recipient, subject, source_file, link, snippet) in enumerate(self.rows, 1):
+                label = html.escape(key)
+                if link:
+                    label = f'<a href="{html.escape(link)}">{label}</a>'
+                f.write(f'<tr><td>{number}</td><td>{html.escape(recipient)}</td><td>{html.escape(subject)}</td>'
+                        f'<td>{html.escape(source_file)}</td><td>{label}<br>{html.escape(snippet)}</td></tr>\n')
+            f.write('</table>\n</body>\n</html>\n')
+        return self.index_path
+
+    def close(self):
+        return self.write_index()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+def mbox_index_path(path):
+    """`<name>.html` next to the mbox, or `<path>.html` if that would be the mbox itself."""
+    root, extension = os.path.splitext(path)
+    if extension.lower() == '.html':
+        return path + '.html'
+    return root + '.html'
+
+class MboxSink(PreviewSink):
+    """Streams every message into a single mbox file, with `<name>.html` as its index."""
+
+    def __init__(self, path):
+        super().__init__(mbox_index_path(path))
+        self.path = path
+        self._file = open(path, 'wb', buffering=WRITE_BUFFER)
+
+    def add(self, key, msg, source_file=None):
+        self._file.write(MBOX_FROM_LINE)
+        # The message's own (compat32) policy without header refolding; the other policies are far slower here
+        BytesGenerator(self._file, mangle_from_=True, maxheaderlen=0).flatten(msg)
+        self._file.write(b'\n')
+        self._record(key, msg, source_file, None)
+
+    def close(self):
+        self._file.close()
+        return super().close()
+
+class EmlDirSink(PreviewSink):
+    """Writes each message to `<key>.eml` (and its HTML body to `<key>.html`) plus index.html."""
+
+    def __init__(self, directory):
+        super().__init__(os.path.join(directory, INDEX_FILE))
+        self.directory = directory
+
+    def add(self, key, msg, source_file=None):
+        with open(os.path.join(self.directory, f'{key}.eml'), 'wb') as f:
+            BytesGenerator(f, mangle_from_=False, maxheaderlen=0).flatten(msg)
+        body = part_text(msg, 'text/html')
+        link = f'{key}.eml'
+        if body is not None:
+            link = f'{key}.html'
+            with open(os.path.join(self.directory, link), 'w') as f:
+                f.write(body)
+        self._record(key, msg, source_file, link)
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+import os
+import json
+import sqlite3
+import time
+from urllib.parse import quote
+
+# Constants
+DEFAULT_DB_FILE = 'processed_entries.db'
+LEGACY_JSON_FILE = 'processed_entries.json'
+DEFAULT_NAMESPACE = ''
+COMMIT_EVERY = 500  # Inserts per transaction before an intermediate commit
+BUSY_TIMEOUT = 30  # Seconds to wait for another connection's write lock
+QUERY_BATCH = 500  # IDs per IN (...) lookup, below SQLite's variable limit
+
+class ProcessedStore:
+    """Indexed, append-only store of processed entry IDs backed by SQLite.
+
+    Membership checks are primary-key lookups, new IDs are appended with
+    INSERT OR IGNORE, and writes are grouped into WAL transactions so a crash
+    never leaves a half-written file behind.
+
+    IDs are kept per namespace (one per spreadsheet/range), so several
+    stores, each with its own connection, can share one database file from
+    different threads. Data from before namespaces existed (the legacy JSON
+    list and rows of an older database) is assigned to `legacy_namespace`.
+
+    With `read_only`, the store works on an in-memory copy of the database,
+    so lookups behave as usual but nothing written is ever saved.
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_FILE, legacy_path=LEGACY_JSON_FILE,
+                 namespace=DEFAULT_NAMESPACE, legacy_namespace=None, read_only=False):
+        self.db_path = db_path
+        self.namespace = namespace
+        self.legacy_namespace = namespace if legacy_namespace is None else legacy_namespace
+        if read_only:
+            self.conn = sqlite3.connect(':memory:')
+            if os.path.exists(db_path):
+                source = sqlite3.connect(f'file:{quote(os.path.abspath(db_path))}?mode=ro',
+                                         uri=True, timeout=BUSY_TIMEOUT)
+                try:
+                    source.backup(self.conn)
+                finally:
+                    source.close()
+        else:
+            self.conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT)
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('PRAGMA synchronous=NORMAL')
+        self._upgrade_schema()
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS processed_entries (
+                namespace TEXT NOT NULL,
+                entry_id TEXT NOT NULL,
+                processed_at REAL NOT NULL,
+                PRIMARY KEY (namespace, entry_id)
+            ) WITHOUT ROWID
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS watermarks (
+                source TEXT PRIMARY KEY,
+                last_row INTEGER NOT NULL,
+                last_timestamp TEXT,
+                headers TEXT NOT NULL
+            )
+        """)
+        self.conn.commit()
+        self._pending = 0
+
+        if legacy_path:
+            self._migrate_legacy_json(legacy_path)
+
+    def _upgrade_schema(self):
+        """Move entries from the pre-namespace table layout into legacy_namespace."""
+        columns = [row[1] for row in self.conn.execute('PRAGMA table_info(processed_entries)')]
+        if not columns or 'namespace' in columns:
+            return
+
+        with self.conn:
+            self.conn.execute('ALTER TABLE processed_entries RENAME TO processed_entries_v1')
+            self.conn.execute("""
+                CREATE TABLE processed_entries (
+                    namespace TEXT NOT NULL,
+                    entry_id TEXT NOT NULL,
+                    processed_at REAL NOT NULL,
+                    PRIMARY KEY (namespace, entry_id)
+                ) WITHOUT ROWID
+            """)
+            self.conn.execute(
+                'INSERT INTO processed_entries (namespace, entry_id, processed_at) '
+                'SELECT ?, entry_id, processed_at FROM processed_entries_v1',
+                (self.legacy_namespace,))
+            self.conn.execute('DROP TABLE processed_entries_v1')
+        print(f"Upgraded {self.db_path} to per-source namespaces")
+
+    def _get_meta(self, key):
+        row = self.conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        self.conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, value))
+
+    def _migrate_legacy_json(self, legacy_path):
+        """Import IDs from an old processed_entries.json list (once)."""
+        if not os.path.exists(legacy_path) or self._get_meta('legacy_json_imported'):
+            return
+
+        try:
+            with open(legacy_path, 'r') as f:
+                legacy_ids = json.load(f)
+        except Exception as e:
+            print(f"Error reading legacy processed entries file {legacy_path}: {e}")
+            return
+
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO processed_entries (namespace, entry_id, processed_at) '
+                'VALUES (?, ?, ?)',
+                ((self.legacy_namespace, entry_id, now) for entry_id in legacy_ids))
+            self._set_meta('legacy_json_imported', legacy_path)
+        print(f"Migrated {len(legacy_ids)} entries from {legacy_path} to {self.db_path}")
+
+    def __contains__(self, entry_id):
+        return self.conn.execute(
+            'SELECT 1 FROM processed_entries WHERE namespace = ? AND entry_id = ?',
+            (self.namespace, entry_id)).fetchone() is not None
+
+    def __len__(self):
+        return self.conn.execute(
+            'SELECT COUNT(*) FROM processed_entries WHERE namespace = ?', (self.namespace,)).fetchone()[0]
+
+    def known_ids(self, entry_ids):
+        """Return the subset of `entry_ids` already recorded, as a set."""
+        entry_ids = list(entry_ids)
+        known = set()
+        for i in range(0, len(entry_ids), QUERY_BATCH):
+            batch = entry_ids[i:i + QUERY_BATCH]
+            placeholders = ','.join('?' * len(batch))
+            rows = self.conn.execute(
+                f'SELECT entry_id FROM processed_entries '
+                f'WHERE namespace = ? AND entry_id IN ({placeholders})',
+                [self.namespace] + batch)
+            known.update(row[0] for row in rows)
+        return known
+
+    def add(self, entry_id):
+        """Record an entry ID as processed. Returns True if it was new."""
+        cursor = self.conn.execute(
+            'INSERT OR IGNORE INTO processed_entries (namespace, entry_id, processed_at) '
+            'VALUES (?, ?, ?)',
+            (self.namespace, entry_id, time.time()))
+        self._pending += 1
+        if self._pending >= COMMIT_EVERY:
+            self.commit()
+        return cursor.rowcount == 1
+
+    def get_id_scheme(self):
+        """Return the entry ID scheme recorded for this namespace, or None."""
+        return self._get_meta(f'id_scheme:{self.namespace}')
+
+    def set_id_scheme(self, scheme):
+        """Record which entry ID scheme this namespace's IDs use."""
+        self._set_meta(f'id_scheme:{self.namespace}', scheme)
+
+    def get_watermark(self, source):
+        """Return the stored watermark for a source as a dict, or None."""
+        row = self.conn.execute(
+            'SELECT last_row, last_timestamp, headers FROM watermarks WHERE source = ?',
+            (source,)).fetchone()
+        if not row:
+            return None
+        return {
+            'last_row': row[0],
+            'last_timestamp': row[1],
+            'headers': json.loads(row[2])
+        }
+
+    def set_watermark(self, source, last_row, last_timestamp, headers):
+        """Persist the last processed sheet row, its Timestamp and the header row."""
+        self.conn.execute(
+            'INSERT OR REPLACE INTO watermarks (source, last_row, last_timestamp, headers) '
+            'VALUES (?, ?, ?, ?)',
+            (source, last_row, last_timestamp, json.dumps(headers)))
+
+    def clear_watermark(self, source):
+        """Forget the watermark so the next run does a full read."""
+        self.conn.execute('DELETE FROM watermarks WHERE source = ?', (source,))
+
+    def commit(self):
+        """Flush pending inserts to disk."""
+        self.conn.commit()
+        self._pending = 0
+
+    def close(self):
+        """Commit outstanding writes and close the database."""
+        self.commit()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
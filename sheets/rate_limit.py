@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+import time
+import random
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+# Constants
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+MAX_RETRIES = 6
+BASE_DELAY = 1.0  # Seconds before the first retry (before jitter)
+MAX_DELAY = 64.0  # Upper bound on a single backoff delay
+
+class TokenBucket:
+    """Thread-safe token bucket rate limiter.
+
+    Tokens refill continuously at `rate` per second up to `capacity`;
+    acquire() blocks until a token is available. pause() stops handing out
+    tokens for a while, e.g. when the server answered with Retry-After, so
+    every thread sharing the bucket backs off together.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self._lock = threading.Lock()
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+
+    @classmethod
+    def per_minute(cls, requests_per_minute, burst=None):
+        """Create a bucket from a per-minute quota."""
+        return cls(requests_per_minute / 60.0, burst)
+
+    def set_rate(self, rate, capacity=None):
+        """Change the refill rate (and optionally the burst size)."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = rate
+            if capacity is not None:
+                self.capacity = capacity
+            self._tokens = min(self._tokens, self.capacity)
+
+    def _refill(self, now):
+        elapsed = max(0.0, now - self._updated)
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._updated = max(self._updated, now)
+
+    def acquire(self, tokens=1):
+        """Block until `tokens` are available and take them."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now >= self._paused_until:
+                    self._refill(now)
+                    if self._tokens >= tokens:
+                        self._tokens -= tokens
+                        return
+                    wait = (tokens - self._tokens) / self.rate
+                else:
+                    wait = self._paused_until - now
+            time.sleep(wait)
+
+    def try_acquire(self, tokens=1):
+        """Take `tokens` if they are available now.
+
+        Returns 0.0 on success, otherwise the seconds until they will be
+        (without taking anything).
+        """
+        with self._lock:
+            now = time.monotonic()
+            if now < self._paused_until:
+                return self._paused_until - now
+            self._refill(now)
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def pause(self, seconds):
+        """Stop handing out tokens for `seconds` and drop any saved-up burst."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0
+            self._updated = max(self._updated, self._paused_until)
+
+def parse_retry_after(value):
+    """Parse a Retry-After header (seconds or HTTP date) into seconds, or None."""
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+def error_details(error):
+    """Return (status, retry_after_seconds) for an HTTP error, or (None, None)."""
+    resp = getattr(error, 'resp', None)
+    if resp is None:
+        return None, None
+    status = getattr(resp, 'status', None)
+    retry_after = resp.get('retry-after') if hasattr(resp, 'get') else None
+    return status, parse_retry_after(retry_after)
+
+def is_retryable(error):
+    """Quota errors, server errors and dropped connections are worth retrying."""
+    status, _ = error_details(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    return isinstance(error, OSError)
+
+def backoff_delay(attempt, base_delay=BASE_DELAY, max_delay=MAX_DELAY):
+    """Exponential backoff with full jitter for a 0-based attempt number."""
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+def call_with_retry(func, limiter=None, max_retries=MAX_RETRIES,
+                    base_delay=BASE_DELAY, max_delay=MAX_DELAY):
+    """Call `func()` under the rate limiter, retrying transient failures.
+
+    Waits for the server's Retry-After when one is given (pausing the shared
+    limiter for everyone), otherwise sleeps with jittered exponential
+    backoff. The last error is re-raised once retries are exhausted.
+    """
+    for attempt in range(max_retries + 1):
+        if limiter:
+            limiter.acquire()
+        try:
+            return func()
+        except Exception as e:
+            if attempt == max_retries or not is_retryable(e):
+                raise
+            status, retry_after = error_details(e)
+            if retry_after is not None:
+                delay = retry_after
+                if limiter:
+                    limiter.pause(delay)
+            else:
+                delay = backoff_delay(attempt, base_delay, max_delay)
+            reason = status if status is not None else e.__class__.__name__
+            print(f"Request failed ({reason}), retry {attempt + 1}/{max_retries} in {delay:.1f}s")
+            time.sleep(delay)
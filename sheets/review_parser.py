@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+import os
+import re
+import sqlite3
+import time
+from urllib.parse import quote
+
+# Constants
+PARSE_CACHE_DB = 'review_cache.db'
+PARSER_VERSION = '2'  # Bump when parse_review's output changes, to invalidate cached records
+COMMIT_EVERY = 500  # Cached records per transaction before an intermediate commit
+BUSY_TIMEOUT = 30  # Seconds to wait for another connection's write lock
+
+HEADING_RE = re.compile(r'#{1,2}\s+(.*?)\s*$')
+EMAIL_RE = re.compile(r'\*\*Email:\*\*\s*(.*)')
+TIMESTAMP_RE = re.compile(r'\*\*Timestamp:\*\*\s*(.*)')
+SEND_MARKER = '- [x] Yes, send email to this respondent'
+COMMENTS_SECTION = 'Comments'
+HTML_COMMENT_RE = re.compile(r'<!--.*?-->', re.DOTALL)
+
+def parse_review(content, file_name=None):
+    """Parse a review markdown file in a single pass over its lines.
+
+    Returns a dict with the respondent's email (first `**Email:**` line),
+    the form timestamp (first `**Timestamp:**` line), whether the send
+    checkbox is ticked, and the text of the `## Comments` section (without
+    the leading HTML placeholder comment). The comments
+    section runs until the next `#` or `##` heading, so reviewers can use
+    `###` and smaller headings in their comments.
+    """
+    email = None
+    timestamp = None
+    should_send = False
+    section = None
+    comment_lines = []
+
+    for line in content.splitlines():
+        if line.startswith('#'):
+            heading = HEADING_RE.match(line)
+            if heading:
+                section = heading.group(1)
+                continue
+        if section == COMMENTS_SECTION:
+            comment_lines.append(line)
+        if email is None and '**Email:**' in line:
+            email = EMAIL_RE.search(line).group(1).strip()
+        if timestamp is None and '**Timestamp:**' in line:
+            timestamp = TIMESTAMP_RE.search(line).group(1).strip()
+        if not should_send and SEND_MARKER in line:
+            should_send = True
+
+    comments = '\n'.join(comment_lines).strip()
+    if comments.startswith('<!--'):
+        comments = HTML_COMMENT_RE.sub('', comments, count=1).strip()
+
+    return {
+        'email': email or None,
+        'timestamp': timestamp or None,
+        'should_send': should_send,
+        'comments': comments,
+        'file_name': file_name
+    }
+
+class ReviewCache:
+    """Persistent cache of parsed review files, keyed by path, mtime and size.
+
+    A file whose mtime and size match its cached record is not opened
+    again. Records are committed in batches, and records for files that
+    have since been moved or deleted are dropped by `prune`.
+
+    With `read_only`, the cache works on an in-memory copy of the database,
+    so existing records are still used but nothing is written to disk.
+    """
+
+    def __init__(self, db_path=PARSE_CACHE_DB, read_only=False):
+        self.db_path = db_path
+        if read_only:
+            self.conn = sqlite3.connect(':memory:')
+            if os.path.exists(db_path):
+                source = sqlite3.connect(f'file:{quote(os.path.abspath(db_path))}?mode=ro',
+                                         uri=True, timeout=BUSY_TIMEOUT)
+                try:
+                    source.backup(self.conn)
+                finally:
+                    source.close()
+        else:
+            self.conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT)
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )
+        """)
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'parser_version'").fetchone()
+        if row is None or row[0] != PARSER_VERSION:
+            # Records from another parser version may lack fields; start over
+            self.conn.execute('DROP TABLE IF EXISTS reviews')
+            self.conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('parser_version', ?)", (PARSER_VERSION,))
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS reviews (
+                path TEXT PRIMARY KEY,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                email TEXT,
+                timestamp TEXT,
+                should_send INTEGER NOT NULL,
+                comments TEXT NOT NULL,
+                parsed_at REAL NOT NULL
+            ) WITHOUT ROWID
+        """)
+        self.conn.commit()
+        self._pending = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path, stat):
+        """Return the cached record for `path` if its mtime and size still match, else None."""
+        row = self.conn.execute(
+            'SELECT email, timestamp, should_send, comments FROM reviews WHERE path = ? AND mtime_ns = ? AND size = ?',
+            (path, stat.st_mtime_ns, stat.st_size)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return {
+            'email': row[0],
+            'timestamp': row[1],
+            'should_send': bool(row[2]),
+            'comments': row[3],
+            'file_name': os.path.basename(path)
+        }
+
+    def put(self, path, stat, record):
+        self.conn.execute(
+            'INSERT OR REPLACE INTO reviews (path, mtime_ns, size, email, timestamp, should_send, comments, parsed_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (path, stat.st_mtime_ns, stat.st_size, record['email'], record.get('timestamp'),
+             int(record['should_send']), record['comments'], time.time()))
+        self._pending += 1
+        if self._pending >= COMMIT_EVERY:
+            self.commit()
+
+    def prune(self, live_paths):
+        """Drop records for paths not in `live_paths`. Returns how many were dropped."""
+        live_paths = set(live_paths)
+        stale = [(path,) for (path,) in self.conn.execute('SELECT path FROM reviews')
+                 if path not in live_paths]
+        self.conn.executemany('DELETE FROM reviews WHERE path = ?', stale)
+        self.commit()
+        return len(stale)
+
+    def commit(self):
+        self.conn.commit()
+        self._pending = 0
+
+    def close(self):
+        self.commit()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
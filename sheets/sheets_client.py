@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+import os
+import sys
+import json
+import threading
+from datetime import datetime
+import httplib2
+import google_auth_httplib2
+from googleapiclient.discovery import build
+from googleapiclient.http import HttpRequest
+from google_auth_oauthlib.flow import InstalledAppFlow
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+from google.auth.credentials import AnonymousCredentials
+from rate_limit import TokenBucket, call_with_retry
+
+# Constants
+TOKEN_FILE = 'token.json'
+CREDENTIALS_FILE = 'credentials.json'
+HTTP_TIMEOUT = 60  # Seconds per request
+REFRESH_MARGIN = 300  # Refresh the access token this many seconds before it expires
+REFRESH_RETRY_INTERVAL = 30  # Seconds to wait after a failed background refresh
+REFRESH_CHECK_INTERVAL = 600  # Seconds between checks when the token has no expiry
+READ_QUOTA_PER_MINUTE = 60  # Sheets API read requests per minute per user
+READ_BURST = 10  # Requests that may be sent back-to-back before throttling kicks in
+ENDPOINT_ENV_VAR = 'SHEETS_API_ENDPOINT'  # e.g. http://127.0.0.1:8765 for fake_sheets_server.py
+
+# Shared by every thread and client in the process
+read_limiter = TokenBucket.per_minute(READ_QUOTA_PER_MINUTE, READ_BURST)
+
+_client = None
+_client_lock = threading.Lock()
+
+def load_credentials(scopes, token_file=TOKEN_FILE, credentials_file=CREDENTIALS_FILE):
+    """Load saved OAuth credentials, refreshing or logging in if needed."""
+    creds = None
+    # The token.json file stores the user's access and refresh tokens
+    if os.path.exists(token_file):
+        with open(token_file) as f:
+            creds = Credentials.from_authorized_user_info(json.load(f), scopes)
+
+    # If there are no valid credentials, let the user log in
+    if not creds or not creds.valid:
+        if creds and creds.expired and creds.refresh_token:
+            creds.refresh(Request())
+        else:
+            # Check if credentials.json exists
+            if not os.path.exists(credentials_file):
+                print(f"Error: {credentials_file} file not found!")
+                print("Please download OAuth 2.0 Client ID credentials from the Google Cloud Console")
+                print(f"and save them as {credentials_file} in the current directory.")
+                sys.exit(1)
+
+            flow = InstalledAppFlow.from_client_secrets_file(credentials_file, scopes)
+            creds = flow.run_local_server(port=0)
+
+        # Save the credentials for the next run
+        save_credentials(creds, token_file)
+
+    return creds
+
+def configure_read_quota(requests_per_minute, burst=READ_BURST):
+    """Set the shared read limiter from the project's per-minute read quota."""
+    read_limiter.set_rate(requests_per_minute / 60.0, burst)
+
+class RateLimitedRequest(HttpRequest):
+    """HttpRequest whose execute() waits on the shared limiter and retries.
+
+    429 and 5xx responses are retried with jittered exponential backoff,
+    honoring Retry-After; other errors are raised unchanged.
+    """
+
+    def execute(self, http=None, num_retries=0):
+        return call_with_retry(
+            lambda: super(RateLimitedRequest, self).execute(http=http),
+            limiter=read_limiter)
+
+def save_credentials(creds, token_file=TOKEN_FILE):
+    """Atomically write credentials to the token file."""
+    tmp_file = f"{token_file}.tmp"
+    with open(tmp_file, 'w') as token:
+        token.write(creds.to_json())
+    os.replace(tmp_file, token_file)
+
+class SheetsClient:
+    """Long-lived Google Sheets API client.
+
+    The service object is built once from the discovery document bundled
+    with google-api-python-client, so no discovery request is made, and
+    every request it creates is rate limited and retried (see
+    RateLimitedRequest). Each thread gets its own authorized httplib2.Http,
+    which keeps its connection to the API alive between requests
+    (httplib2.Http is not thread-safe, so it cannot be shared). A daemon
+    thread refreshes the access token shortly before it expires, so requests
+    never wait on a refresh round-trip.
+    """
+
+    def __init__(self, scopes, token_file=TOKEN_FILE, credentials_file=CREDENTIALS_FILE,
+                 endpoint=None):
+        self.scopes = scopes
+        self.token_file = token_file
+        self.endpoint = endpoint
+        if endpoint:
+            # A local stand-in server (see fake_sheets_server.py) needs no OAuth
+            self.creds = AnonymousCredentials()
+        else:
+            self.creds = load_credentials(scopes, token_file, credentials_file)
+        self._local = threading.local()
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+
+        self.service = build(
+            'sheets', 'v4',
+            http=self._thread_http(),
+            requestBuilder=self._build_request,
+            static_discovery=True,
+            client_options={'api_endpoint': endpoint} if endpoint else None)
+
+        self._refresher = None
+        if getattr(self.creds, 'refresh_token', None):
+            self._refresher = threading.Thread(target=self._refresh_loop, daemon=True)
+            self._refresher.start()
+
+    def _thread_http(self):
+        """Return this thread's persistent authorized HTTP connection."""
+        http = getattr(self._local, 'http', None)
+        if http is None:
+            http = google_auth_httplib2.AuthorizedHttp(
+                self.creds, http=httplib2.Http(timeout=HTTP_TIMEOUT))
+            self._local.http = http
+        return http
+
+    def _build_request(self, http, *args, **kwargs):
+        # Route every request through the calling thread's own connection
+        return RateLimitedRequest(self._thread_http(), *args, **kwargs)
+
+    def _seconds_until_refresh(self):
+        if not self.creds.expiry:
+            return REFRESH_CHECK_INTERVAL
+        # google-auth stores expiry as a naive UTC datetime
+        remaining = (self.creds.expiry - datetime.utcnow()).total_seconds()
+        return max(remaining - REFRESH_MARGIN, 0)
+
+    def refresh(self):
+        """Refresh the access token now and persist it."""
+        with self._refresh_lock:
+            self.creds.refresh(Request())
+            save_credentials(self.creds, self.token_file)
+
+    def _refresh_loop(self):
+        while not self._stop.is_set():
+            if self._stop.wait(self._seconds_until_refresh()):
+                break
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Error refreshing access token: {e}")
+                self._stop.wait(REFRESH_RETRY_INTERVAL)
+
+    def spreadsheets(self):
+        return self.service.spreadsheets()
+
+    def close(self):
+        """Stop the background refresher."""
+        self._stop.set()
+
+def get_sheets_client(scopes, token_file=TOKEN_FILE, credentials_file=CREDENTIALS_FILE):
+    """Return the process-wide SheetsClient, creating it on first use.
+
+    If the SHEETS_API_ENDPOINT environment variable is set, the client talks
+    to that endpoint without authentication instead of to Google.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = SheetsClient(scopes, token_file, credentials_file,
+                                   endpoint=os.environ.get(ENDPOINT_ENV_VAR))
+        return _client
+
+def reset_sheets_client():
+    """Drop the process-wide client, e.g. after the token file was removed."""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = None
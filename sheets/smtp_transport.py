@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+import os
+import ssl
+import smtplib
+import threading
+
+# Constants
+SMTP_PORT = 587
+SMTP_TIMEOUT = 30  # Seconds
+MAX_MESSAGES_PER_CONNECTION = 100  # Rotate the connection after this many messages
+# Replies that mean the server is closing the connection, so reconnecting is safe
+RECONNECT_CODES = {421}
+
+def is_transient_error(error):
+    """True if an SMTP send failure is worth retrying later (4xx or connection trouble)."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    return isinstance(error, (smtplib.SMTPServerDisconnected, OSError))
+
+class SMTPTransport:
+    """Reusable, authenticated SMTP connection for sending many messages.
+
+    The connection (and its STARTTLS handshake and login) is opened on the
+    first send and reused for up to `max_messages` messages before being
+    rotated. If the server has dropped an idle connection, or answers 421,
+    the transport reconnects and retries the message once.
+
+    Not thread-safe: use one transport per thread.
+    """
+
+    def __init__(self, host, port=SMTP_PORT, username=None, password=None,
+                 starttls=True, use_ssl=False, max_messages=MAX_MESSAGES_PER_CONNECTION,
+                 timeout=SMTP_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls and not use_ssl
+        self.use_ssl = use_ssl
+        self.max_messages = max_messages
+        self.timeout = timeout
+        self._server = None
+        self._sent_on_connection = 0
+        self.connections_opened = 0
+        self.messages_sent = 0
+
+    @classmethod
+    def from_env(cls, **overrides):
+        """Create a transport from SMTP_HOST, SMTP_PORT, SMTP_USERNAME, SMTP_PASSWORD,
+        SMTP_STARTTLS and SMTP_SSL environment variables.
+
+        Returns None if SMTP_HOST is not set.
+        """
+        host = os.environ.get('SMTP_HOST')
+        if not host:
+            return None
+        settings = {
+            'host': host,
+            'port': int(os.environ.get('SMTP_PORT', SMTP_PORT)),
+            'username': os.environ.get('SMTP_USERNAME') or None,
+            'password': os.environ.get('SMTP_PASSWORD') or None,
+            'starttls': os.environ.get('SMTP_STARTTLS', '1') not in ('0', 'false', 'no'),
+            'use_ssl': os.environ.get('SMTP_SSL', '0') in ('1', 'true', 'yes'),
+            'max_messages': int(os.environ.get('SMTP_MAX_MESSAGES', MAX_MESSAGES_PER_CONNECTION))
+        }
+        settings.update(overrides)
+        return cls(**settings)
+
+    def _connect(self):
+        if self.use_ssl:
+            server = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout,
+                                      context=ssl.create_default_context())
+        else:
+            server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.starttls:
+                server.starttls(context=ssl.create_default_context())
+        if self.username:
+            server.login(self.username, self.password or '')
+        self._server = server
+        self._sent_on_connection = 0
+        self.connections_opened += 1
+
+    def _disconnect(self):
+        if self._server is None:
+            return
+        try:
+            self._server.quit()
+        except (smtplib.SMTPException, OSError):
+            # The connection is already gone; nothing left to close cleanly
+            self._server.close()
+        self._server = None
+
+    def send(self, msg):
+        """Send an email.message.Message, reconnecting once if the connection dropped."""
+        if self._server is None or self._sent_on_connection >= self.max_messages:
+            self._disconnect()
+            self._connect()
+
+        try:
+            self._server.send_message(msg)
+        except (smtplib.SMTPServerDisconnected, ConnectionError):
+            self._reconnect_and_send(msg)
+        except smtplib.SMTPResponseException as e:
+            if e.smtp_code not in RECONNECT_CODES:
+                raise
+            self._reconnect_and_send(msg)
+        else:
+            self._sent_on_connection += 1
+            self.messages_sent += 1
+
+    def _reconnect_and_send(self, msg):
+        self._server.close()
+        self._server = None
+        self._connect()
+        self._server.send_message(msg)
+        self._sent_on_connection += 1
+        self.messages_sent += 1
+
+    def close(self):
+        """Close the connection (QUIT)."""
+        self._disconnect()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+class ThreadLocalTransport:
+    """Gives each thread its own SMTPTransport built by `factory`."""
+
+    def __init__(self, factory):
+        self.factory = factory
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._transports = []
+
+    def get(self):
+        transport = getattr(self._local, 'transport', None)
+        if transport is None:
+            transport = self.factory()
+            self._local.transport = transport
+            with self._lock:
+                self._transports.append(transport)
+        return transport
+
+    def send(self, msg):
+        self.get().send(msg)
+
+    @property
+    def connections_opened(self):
+        return sum(t.connections_opened for t in self._transports)
+
+    @property
+    def messages_sent(self):
+        return sum(t.messages_sent for t in self._transports)
+
+    def close(self):
+        """Close every thread's connection."""
+        with self._lock:
+            for transport in self._transports:
+                transport.close()
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+import os
+import re
+import hashlib
+import argparse
+import threading
+try:
+    import fcntl
+except ImportError:  # Windows: the index is never compacted automatically
+    fcntl = None
+
+# Constants
+SHARD_DEPTH = 2  # Directory levels below the root
+SHARD_WIDTH = 2  # Hex characters per level, so 256 directories per level
+INDEX_FILE = '.index'
+COMPACT_MIN_LINES = 1000  # Index logs shorter than this are never compacted
+FILE_EXTENSION = '.md'
+DEFAULT_ROOTS = ['markdown_files', 'processed_markdown/success', 'processed_markdown/failure']
+HEX_ID_RE = re.compile(r'[0-9a-f]{%d,}' % (SHARD_DEPTH * SHARD_WIDTH))
+
+def shard_parts(entry_id):
+    """Return the shard directory names for an entry ID, e.g. ['1d', 'd7'] for '1dd7b3...'.
+
+    Entry IDs are hex digests, so their own prefix is used. Any other file
+    name is hashed first so it still lands in a stable shard.
+    """
+    key = entry_id.lower()
+    if not HEX_ID_RE.fullmatch(key):
+        key = hashlib.blake2b(entry_id.encode('utf-8'), digest_size=8).hexdigest()
+    return [key[i * SHARD_WIDTH:(i + 1) * SHARD_WIDTH] for i in range(SHARD_DEPTH)]
+
+def entry_id_of(path):
+    """The entry ID a markdown file is named after."""
+    return os.path.splitext(os.path.basename(path))[0]
+
+class ShardedDir:
+    """A directory of `<id>.md` files spread over hash-prefix subdirectories.
+
+    `root/1d/d7/1dd7b3....md` instead of one flat directory, so no single
+    directory grows to hundreds of thousands of entries. Shard directories
+    are created once per process. The IDs stored under the root are
+    recorded in an append-only `.index` log (`+id` / `-id` lines), so the
+    files can be listed without walking every shard. When most of the log
+    is dead (IDs added and later removed), reading it rewrites it with just
+    the live IDs, so listing stays proportional to the files stored rather
+    than to every move ever made. Flat `*.md` files directly under the root,
+    from older runs or dropped in by hand, are always included as well.
+    """
+
+    def __init__(self, root, extension=FILE_EXTENSION):
+        self.root = root
+        self.extension = extension
+        self.index_path = os.path.join(root, INDEX_FILE)
+        self._created = set()
+        self._lock = threading.Lock()
+
+    def path_for(self, entry_id):
+        return os.path.join(self.root, *shard_parts(entry_id), entry_id + self.extension)
+
+    def prepare(self, entry_id):
+        """Return the path for an entry, creating its shard directory if needed."""
+        path = self.path_for(entry_id)
+        parent = os.path.dirname(path)
+        if parent not in self._created:
+            os.makedirs(parent, exist_ok=True)
+            with self._lock:
+                self._created.add(parent)
+        return path
+
+    def _open_index(self, flags, lock):
+        """Open the index and flock it, reopening if it was replaced by a compaction meanwhile."""
+        while True:
+            fd = os.open(self.index_path, flags, 0o644)
+            if fcntl is None:
+                return fd
+            fcntl.flock(fd, lock)
+            try:
+                if os.fstat(fd).st_ino == os.stat(self.index_path).st_ino:
+                    return fd
+            except FileNotFoundError:
+                pass
+            os.close(fd)
+
+    def _append_index(self, line):
+        # One write() per line with O_APPEND, so concurrent writers never interleave within a line.
+        # Appenders share the lock; only a compaction takes it exclusively.
+        os.makedirs(self.root, exist_ok=True)
+        fd = self._open_index(os.O_WRONLY | os.O_APPEND | os.O_CREAT, fcntl and fcntl.LOCK_SH)
+        try:
+            os.write(fd, line.encode('utf-8'))
+        finally:
+            os.close(fd)
+
+    def record(self, entry_id):
+        """Note in the index that `entry_id` is stored here."""
+        self._append_index(f'+{entry_id}\n')
+
+    def forget(self, entry_id):
+        """Note in the index that `entry_id` is no longer stored here."""
+        self._append_index(f'-{entry_id}\n')
+
+    def add_file(self, src_path, entry_id=None):
+        """Move a file into its shard, record it and return the new path."""
+        entry_id = entry_id or entry_id_of(src_path)
+        target = self.prepare(entry_id)
+        os.rename(src_path, target)
+        self.record(entry_id)
+        return target
+
+    def locate(self, entry_id):
+        """Return the path of an entry's file (sharded or flat), or None."""
+        for path in (self.path_for(entry_id), os.path.join(self.root, entry_id + self.extension)):
+            if os.path.exists(path):
+                return path
+        return None
+
+    @staticmethod
+    def _replay(lines):
+        """Replay index lines into (set of live IDs, number of lines)."""
+        ids = set()
+        count = 0
+        for line in lines:
+            count += 1
+            entry_id = line[1:].rstrip('\n')
+            if line.startswith('+'):
+                ids.add(entry_id)
+            elif line.startswith('-'):
+                ids.discard(entry_id)
+        return ids, count
+
+    def indexed_ids(self):
+        """Replay the index log into the set of IDs stored here, compacting it if mostly dead."""
+        try:
+            with open(self.index_path, 'r') as f:
+                ids, count = self._replay(f)
+        except FileNotFoundError:
+            return set()
+        if count >= COMPACT_MIN_LINES and count > 2 * len(ids):
+            ids = self.compact_index()
+        return ids
+
+    def compact_index(self):
+        """Rewrite the index with one `+id` line per live ID. Returns the live IDs.
+
+        Holds the index lock exclusively, so no append is lost between
+        reading the log and replacing it.
+        """
+        if fcntl is None:
+            with open(self.index_path, 'r') as f:
+                return self._replay(f)[0]
+        fd = self._open_index(os.O_RDONLY, fcntl.LOCK_EX)
+        try:
+            with os.fdopen(os.dup(fd), 'r') as f:
+                ids, _ = self._replay(f)
+            self._write_index(ids)
+        finally:
+            os.close(fd)
+        return ids
+
+    def flat_files(self):
+        """`*.md` files directly under the root (not yet sharded)."""
+        try:
+            with os.scandir(self.root) as entries:
+                return [entry.path for entry in entries
+                        if entry.name.endswith(self.extension) and entry.is_file()]
+        except FileNotFoundError:
+            return []
+
+    def files(self):
+        """Paths of all stored files, sorted by entry ID, without walking the shards."""
+        paths = {entry_id_of(path): path for path in self.flat_files()}
+        for entry_id in self.indexed_ids():
+            if entry_id not in paths:
+                path = self.path_for(entry_id)
+                if os.path.exists(path):
+                    paths[entry_id] = path
+        return [paths[entry_id] for entry_id in sorted(paths)]
+
+    def walk(self):
+        """Every file actually on disk under the root, sharded or flat."""
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            for name in filenames:
+                if name.endswith(self.extension):
+                    yield os.path.join(dirpath, name)
+
+    def rebuild_index(self):
+        """Rewrite the index from the files on disk. Returns the number of entries."""
+        ids = sorted({entry_id_of(path) for path in self.walk()
+                      if os.path.dirname(path) != os.path.normpath(self.root)})
+        os.makedirs(self.root, exist_ok=True)
+        self._write_index(ids)
+        return len(ids)
+
+    def _write_index(self, ids):
+        """Atomically replace the index with one `+id` line per ID, in sorted order."""
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.writelines(f'+{entry_id}\n' for entry_id in sorted(ids))
+        os.replace(tmp_path, self.index_path)
+
+    def migrate(self):
+        """Move flat files (and files in the wrong shard) into place, then rebuild the index.
+
+        Returns the number of files moved.
+        """
+        moved = 0
+        for path in list(self.walk()):
+            entry_id = entry_id_of(path)
+            target = self.path_for(entry_id)
+            if os.path.abspath(path) == os.path.abspath(target):
+                continue
+            if os.path.exists(target):
+                print(f"Skipping {path}: {target} already exists")
+                continue
+            os.rename(path, self.prepare(entry_id))
+            moved += 1
+        self.rebuild_index()
+        return moved
+
+_dirs = {}
+_dirs_lock = threading.Lock()
+
+def sharded_dir(root):
+    """Return the process-wide ShardedDir for `root`, so shard directories are created once."""
+    key = os.path.abspath(root)
+    with _dirs_lock:
+        directory = _dirs.get(key)
+        if directory is None:
+            directory = ShardedDir(root)
+            _dirs[key] = directory
+        return directory
+
+def main():
+    parser = argparse.ArgumentParser(description='Move markdown directories to the sharded layout and rebuild their indexes')
+    parser.add_argument('roots', nargs='*', default=DEFAULT_ROOTS,
+                        help=f'Directories to migrate (default: {" ".join(DEFAULT_ROOTS)})')
+    parser.add_argument('--rebuild-index', action='store_true',
+                        help='Only rebuild the index files from what is on disk; do not move files')
+    args = parser.parse_args()
+
+    for root in args.roots:
+        if not os.path.isdir(root):
+            print(f"Skipping {root}: not a directory")
+            continue
+        directory = ShardedDir(root)
+        if args.rebuild_index:
+            count = directory.rebuild_index()
+            print(f"Rebuilt index of {root}: {count} entries")
+        else:
+            moved = directory.migrate()
+            print(f"Migrated {root}: moved {moved} files, {len(directory.indexed_ids())} entries indexed")
+
+if __name__ == "__main__":
+    main()
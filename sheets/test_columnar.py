@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+import argparse
+
+import fetch_new_entries
+from columnar import values_to_frame, frame_entry_ids
+from processed_store import ProcessedStore
+from fetch_new_entries import rows_to_dicts, generate_entry_id, generate_legacy_entry_id
+
+def test_duplicate_headers_match_the_dictionary_path():
+    headers = ['Timestamp', 'Email Address', 'Comment', 'Comment']
+    rows = [
+        ['1/1/2024 10:00:00', 'a@example.com', 'first', 'second'],
+        ['1/1/2024 11:00:00', 'b@example.com', 'only'],
+    ]
+    frame = values_to_frame([headers] + rows)
+    dicts = rows_to_dicts(headers, rows)
+
+    # The last "Comment" column wins, as it does when building dictionaries
+    assert frame.to_dict('records') == dicts
+    assert list(frame.columns) == ['Timestamp', 'Email Address', 'Comment']
+    assert list(frame_entry_ids(frame)) == [generate_legacy_entry_id(row) for row in dicts]
+    id_columns = ['Timestamp', 'Comment']
+    assert list(frame_entry_ids(frame, id_columns)) == [generate_entry_id(row, id_columns) for row in dicts]
+
+def test_columnar_ingest_writes_repeated_responses_once(tmp_path, monkeypatch):
+    headers = ['Timestamp', 'Email Address', 'Did you?']
+    response = ['1/1/2024 10:00:00', 'a@example.com', 'yes']
+    values = [headers, response, list(response), ['1/1/2024 11:00:00', 'b@example.com', 'no']]
+    monkeypatch.setattr(fetch_new_entries, 'get_sheet_values', lambda source: values)
+    source = dict(fetch_new_entries.DEFAULT_SOURCE, output_dir=str(tmp_path / 'markdown_files'))
+    args = argparse.Namespace(force_all=False, parquet=None, id_columns=fetch_new_entries.ID_COLUMNS)
+
+    with ProcessedStore(str(tmp_path / 'processed.db'), None) as store:
+        assert fetch_new_entries.process_new_entries_columnar(store, args, source) == 2
+        assert len(store) == 2
+    assert len(list((tmp_path / 'markdown_files').rglob('*.md'))) == 2
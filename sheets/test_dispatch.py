@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+import time
+import threading
+from email.message import EmailMessage
+
+from dispatch import DispatchEngine
+
+class RecordingTransport:
+    """Stands in for SMTPTransport, recording when each message was sent."""
+
+    def __init__(self, sent, lock, start):
+        self.sent = sent
+        self.lock = lock
+        self.start = start
+        self.connections_opened = 1
+        self.messages_sent = 0
+
+    def send(self, msg):
+        with self.lock:
+            self.sent.append((msg['To'], time.monotonic() - self.start))
+        self.messages_sent += 1
+
+    def close(self):
+        pass
+
+def make_message(recipient):
+    msg = EmailMessage()
+    msg['To'] = recipient
+    msg.set_content('hello')
+    return msg
+
+def test_throttled_domain_does_not_hold_back_other_domains():
+    sent = []
+    lock = threading.Lock()
+    start = time.monotonic()
+    engine = DispatchEngine(lambda: RecordingTransport(sent, lock, start), concurrency=2,
+                            domain_rates={'slow.example': 60, 'fast.example': 600})
+    # The slow domain (1/s) comes first and would occupy every worker if they waited for its tokens
+    recipients = [f'user{i}@slow.example' for i in range(3)] + [f'user{i}@fast.example' for i in range(10)]
+    jobs = [(recipient, recipient, make_message(recipient)) for recipient in recipients]
+
+    results = list(engine.run(jobs))
+
+    assert sorted(key for key, _, _ in results) == sorted(recipients)
+    assert all(success for _, success, _ in results)
+    slow = [at for to, at in sent if to.endswith('@slow.example')]
+    fast = [at for to, at in sent if to.endswith('@fast.example')]
+    # The fast domain finishes while the throttled domain's queue is still draining
+    assert max(fast) < max(slow)
+    # Each domain still gets its own rate
+    assert all(b - a >= 0.9 for a, b in zip(slow, slow[1:]))
+    assert all(b - a >= 0.08 for a, b in zip(fast, fast[1:]))
@@ -0,0 +1,166 @@
+import os
+import json
+import queue
+import threading
+from math import gcd, ceil
+import numpy as np
+import soundfile as sf
+
+# Constants
+# Output format name -> (file extension, soundfile format, subtype)
+FORMATS = {
+    "wav": ("wav", "WAV", "PCM_16"),
+    "flac": ("flac", "FLAC", "PCM_16"),
+    "opus": ("opus", "OGG", "OPUS"),
+}
+DEFAULT_FORMAT = "flac"
+OPUS_RATES = [8000, 12000, 16000, 24000, 48000]  # The only sample rates Opus supports
+ENCODE_BLOCK = 65536  # Frames read, resampled and written at a time
+ZERO_CROSSINGS = 16  # Half-width of the resampling filter, in zero crossings of its sinc
+
+def output_rate(fmt, source_rate, target_rate=None):
+    """The sample rate a recording is stored at, given the format and an optional target rate."""
+    rate = target_rate or source_rate
+    if fmt == "opus" and rate not in OPUS_RATES:
+        # Nearest supported rate at or above the requested one, so no bandwidth is lost
+        rate = min((r for r in OPUS_RATES if r >= rate), default=OPUS_RATES[-1])
+    return rate
+
+def output_path(wav_path, fmt):
+    return os.path.splitext(wav_path)[0] + "." + FORMATS[fmt][0]
+
+class Resampler:
+    """Band-limited resampling by a rational factor with a windowed-sinc polyphase filter.
+
+    Output sample `n` sits at input position `n * down / up`, so the
+    fractional offset repeats every `up` outputs and one row of filter taps
+    per phase is precomputed. Output is produced in chunks, each reading
+    only the input it needs, so memory does not depend on the file length.
+    """
+
+    def __init__(self, source_rate, target_rate, zero_crossings=ZERO_CROSSINGS):
+        step = gcd(source_rate, target_rate)
+        self.up = target_rate // step
+        self.down = source_rate // step
+        cutoff = min(1.0, self.up / self.down)  # Fraction of the source Nyquist frequency kept
+        self.half = ceil(zero_crossings / cutoff)
+        self.offsets = np.arange(-self.half + 1, self.half + 1)  # Tap positions relative to floor(t)
+        phases = (np.arange(self.up) * self.down % self.up) / self.up
+        distance = phases[:, None] - self.offsets[None, :]
+        window = 0.5 + 0.5 * np.cos(np.pi * np.clip(distance / self.half, -1.0, 1.0))
+        taps = cutoff * np.sinc(cutoff * distance) * window
+        self.taps = (taps / taps.sum(axis=1, keepdims=True)).astype(np.float32)
+
+    def output_frames(self, input_frames):
+        return -(-input_frames * self.up // self.down)
+
+    def resample_file(self, source, write, block=ENCODE_BLOCK):
+        """Resample an open SoundFile, passing (frames, channels) chunks to `write`."""
+        total = source.frames
+        for start in range(0, self.output_frames(total), block):
+            n = np.arange(start, min(start + block, self.output_frames(total)))
+            base = n * self.down // self.up
+            first = int(base[0]) - self.half + 1
+            last = int(base[-1]) + self.half + 1
+            segment = np.zeros((last - first, source.channels), dtype=np.float32)
+            lo, hi = max(first, 0), min(last, total)
+            if hi > lo:
+                source.seek(lo)
+                segment[lo - first:hi - first] = source.read(hi - lo, dtype='float32', always_2d=True)
+            index = base[:, None] + self.offsets[None, :] - first
+            write(np.einsum('ntc,nt->nc', segment[index], self.taps[n % self.up]))
+
+def encode_recording(wav_path, fmt, target_rate=None):
+    """Convert a captured WAV to `fmt` (resampling if needed) and delete the WAV.
+
+    The output is written under a temporary name and renamed into place,
+    so a half-written file is never mistaken for a finished one. Returns
+    the output path.
+    """
+    extension, file_format, subtype = FORMATS[fmt]
+    with sf.SoundFile(wav_path) as source:
+        rate = output_rate(fmt, source.samplerate, target_rate)
+        if fmt == "wav" and rate == source.samplerate:
+            return wav_path
+        path = output_path(wav_path, fmt)
+        tmp_path = path + ".tmp"
+        with sf.SoundFile(tmp_path, mode='w', samplerate=rate, channels=source.channels,
+                          format=file_format, subtype=subtype) as output:
+            if rate == source.samplerate:
+                for block in source.blocks(blocksize=ENCODE_BLOCK, dtype='float32', always_2d=True):
+                    output.write(block)
+            else:
+                Resampler(source.samplerate, rate).resample_file(source, output.write)
+    os.replace(tmp_path, path)
+    if path != wav_path:
+        os.remove(wav_path)
+    return path
+
+class BackgroundEncoder:
+    """Encodes captured WAVs on a worker thread, so the next prompt does not wait for it.
+
+    Each snippet's JSON already names the encoded file. If encoding fails,
+    the WAV is kept and the JSON is pointed back at it. Results are
+    collected rather than printed, so the worker never writes to the
+    console while the user is being prompted.
+    """
+
+    def __init__(self, fmt=DEFAULT_FORMAT, target_rate=None):
+        self.fmt = fmt
+        self.target_rate = target_rate
+        self.jobs = queue.Queue()
+        self.lock = threading.Lock()
+        self.finished = []  # (output path, original bytes, encoded bytes)
+        self.errors = []  # (wav path, error)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, wav_path, json_path):
+        self.jobs.put((wav_path, json_path))
+
+    def pending(self):
+        return self.jobs.unfinished_tasks
+
+    def _run(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                self.jobs.task_done()
+                return
+            wav_path, json_path = job
+            try:
+                original = os.path.getsize(wav_path)
+                path = encode_recording(wav_path, self.fmt, self.target_rate)
+                with self.lock:
+                    self.finished.append((path, original, os.path.getsize(path)))
+            except Exception as e:
+                self._restore_wav(wav_path, json_path)
+                with self.lock:
+                    self.errors.append((wav_path, e))
+            finally:
+                self.jobs.task_done()
+
+    def _restore_wav(self, wav_path, json_path):
+        tmp_path = output_path(wav_path, self.fmt) + ".tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        with open(json_path, 'r') as f:
+            metadata = json.load(f)
+        with sf.SoundFile(wav_path) as source:
+            metadata["sample_rate"] = source.samplerate
+        metadata["audio_file"] = os.path.basename(wav_path)
+        metadata["audio_format"] = "wav"
+        with open(json_path, 'w') as f:
+            json.dump(metadata, f, indent=2)
+
+    def take_results(self):
+        """Return and clear the (finished, errors) collected since the last call."""
+        with self.lock:
+            finished, errors = self.finished, self.errors
+            self.finished, self.errors = [], []
+        return finished, errors
+
+    def close(self):
+        """Wait for queued recordings to be encoded and stop the worker."""
+        self.jobs.put(None)
+        self.thread.join()
@@ -0,0 +1,168 @@
+import os
+import numpy as np
+
+# Constants
+HOP_MS = 10  # One feature frame per 10 ms of audio
+WINDOW_MS = 25  # Analysis window for the log-mel spectrogram
+CLIP_LEVEL = 0.999  # Samples at or above this magnitude count as clipped
+LOG_FLOOR = 1e-10
+FEATURE_COLUMNS = ["rms", "zcr"]  # Leading columns of the sidecar; log-mel bands follow
+
+def mel_filterbank(samplerate, n_fft, bands):
+    """Triangular mel filters (HTK mel scale) as a (bands, n_fft // 2 + 1) matrix."""
+    def to_mel(hz):
+        return 2595.0 * np.log10(1.0 + hz / 700.0)
+
+    def to_hz(mel):
+        return 700.0 * (10.0 ** (mel / 2595.0) - 1.0)
+
+    edges = to_hz(np.linspace(0.0, to_mel(samplerate / 2), bands + 2))
+    bins = np.fft.rfftfreq(n_fft, 1.0 / samplerate)
+    lower, center, upper = edges[:-2, None], edges[1:-1, None], edges[2:, None]
+    rising = (bins - lower) / np.maximum(center - lower, LOG_FLOOR)
+    falling = (upper - bins) / np.maximum(upper - center, LOG_FLOOR)
+    return np.maximum(0.0, np.minimum(rising, falling)).astype(np.float32)
+
+class FeatureTracker:
+    """Computes compact features block by block as audio is captured.
+
+    Each 10 ms frame gets its RMS level and zero-crossing rate, plus
+    optionally `mel_bands` log-mel energies over a 25 ms window. All
+    frames ready in a block are computed in one vectorized step, and only
+    a window's worth of samples is carried over between blocks, so the
+    raw audio is never held in memory. Whole-take scalars (peak, RMS,
+    zero-crossing rate, clipped samples) are accumulated alongside.
+    """
+
+    def __init__(self, samplerate, mel_bands=0, hop_ms=HOP_MS, window_ms=WINDOW_MS):
+        self.samplerate = samplerate
+        self.hop_ms = hop_ms
+        self.hop = max(1, round(samplerate * hop_ms / 1000))
+        self.mel_bands = mel_bands
+        self.lookahead = 0
+        if mel_bands:
+            self.window = max(self.hop, round(samplerate * window_ms / 1000))
+            self.n_fft = 1 << (self.window - 1).bit_length()
+            self.hann = np.hanning(self.window).astype(np.float32)
+            self.filters = mel_filterbank(samplerate, self.n_fft, mel_bands)
+            # Each frame's window reaches this far past the frame's own samples
+            self.lookahead = self.window - self.hop
+        self.pending = np.zeros(0, dtype=np.float32)  # Samples not yet assigned to a frame
+        self.prev_negative = None  # Sign of the sample just before `pending`
+        self.rows = []
+        self.frame_peaks = []  # Per-frame peak and clipped-sample counts, kept so `truncate` stays exact
+        self.frame_clipped = []
+        self.samples = 0
+        self.sum_squares = 0.0
+        self.crossings = 0
+
+    def add(self, block):
+        """Feed a (frames, channels) or 1-D block of float samples."""
+        mono = block.mean(axis=1) if block.ndim > 1 else block
+        mono = mono.astype(np.float32, copy=False)
+        if not len(mono):
+            return
+        self.sum_squares += float(np.dot(mono, mono))
+        self.samples += len(mono)
+        self.pending = np.concatenate([self.pending, mono])
+        self._emit(final=False)
+
+    def _emit(self, final):
+        pending = self.pending
+        if final:
+            frames = -(-len(pending) // self.hop)
+        else:
+            frames = max(0, (len(pending) - self.lookahead) // self.hop)
+        if frames == 0:
+            return
+        used = min(len(pending), frames * self.hop)
+        padded = pending
+        needed = frames * self.hop + self.lookahead
+        if len(padded) < needed:
+            padded = np.concatenate([pending, np.zeros(needed - len(pending), dtype=np.float32)])
+
+        body = padded[:frames * self.hop].reshape(frames, self.hop)
+        lengths = np.full(frames, self.hop, dtype=np.float32)
+        lengths[-1] = used - (frames - 1) * self.hop
+        rms = np.sqrt(np.einsum('ij,ij->i', body, body) / lengths)
+        magnitude = np.abs(body)
+        self.frame_peaks.append(magnitude.max(axis=1))
+        self.frame_clipped.append(np.count_nonzero(magnitude >= CLIP_LEVEL, axis=1))
+
+        negative = np.signbit(pending[:used])
+        previous = negative[0] if self.prev_negative is None else self.prev_negative
+        changes = np.zeros(frames * self.hop, dtype=np.float32)
+        changes[:used] = negative != np.concatenate([[previous], negative[:-1]])
+        crossings = changes.reshape(frames, self.hop).sum(axis=1)
+        self.crossings += int(crossings.sum())
+        self.prev_negative = negative[-1]
+
+        columns = [rms, crossings / lengths]
+        if self.mel_bands:
+            windows = np.lib.stride_tricks.sliding_window_view(padded, self.window)[::self.hop][:frames]
+            power = np.abs(np.fft.rfft(windows * self.hann, n=self.n_fft, axis=1)) ** 2
+            columns.extend(np.log(power.astype(np.float32) @ self.filters.T + LOG_FLOOR).T)
+        self.rows.append(np.column_stack(columns).astype(np.float32))
+        self.pending = pending[used:].copy()
+
+    def truncate(self, samples):
+        """Drop frames past the first `samples` samples, after trailing silence is cut from the file.
+
+        The whole-take scalars are recomputed from the frames that are kept.
+        """
+        if len(self.pending):
+            self._emit(final=True)
+        if not self.rows or samples >= self.samples:
+            return
+        frames = -(-samples // self.hop)
+        matrix = np.concatenate(self.rows)[:frames]
+        self.rows = [matrix]
+        self.frame_peaks = [np.concatenate(self.frame_peaks)[:frames]]
+        self.frame_clipped = [np.concatenate(self.frame_clipped)[:frames]]
+        self.samples = samples
+        self.sum_squares = float(np.dot(matrix[:, 0], matrix[:, 0])) * self.hop
+        self.crossings = int(round(float(matrix[:, 1].sum()) * self.hop))
+
+    def finish(self):
+        """Flush the last partial frame and return the (frames, columns) float32 matrix."""
+        if len(self.pending):
+            self._emit(final=True)
+        width = len(FEATURE_COLUMNS) + self.mel_bands
+        if not self.rows:
+            return np.zeros((0, width), dtype=np.float32)
+        return np.concatenate(self.rows)
+
+    def summary(self):
+        """Whole-take scalar features for the metadata."""
+        if len(self.pending):
+            self._emit(final=True)
+        peak = float(max((frame.max() for frame in self.frame_peaks if len(frame)), default=0.0))
+        clipped = int(sum(int(frame.sum()) for frame in self.frame_clipped))
+        rms = (self.sum_squares / self.samples) ** 0.5 if self.samples else 0.0
+        return {
+            "peak": round(peak, 6),
+            "peak_dbfs": round(float(20 * np.log10(max(peak, LOG_FLOOR))), 2),
+            "rms": round(rms, 6),
+            "rms_dbfs": round(float(20 * np.log10(max(rms, LOG_FLOOR))), 2),
+            "zero_crossing_rate": round(self.crossings / self.samples, 6) if self.samples else 0.0,
+            "clipped_samples": clipped
+        }
+
+def save_features(path, tracker):
+    """Write the frame features to a `.npy` sidecar and return its metadata entry.
+
+    The sidecar is a plain float32 matrix, so it can be opened with
+    `np.load(path, mmap_mode='r')` without reading it all.
+    """
+    matrix = tracker.finish()
+    np.save(path, matrix)
+    columns = list(FEATURE_COLUMNS)
+    if tracker.mel_bands:
+        columns.append(f"log_mel[{tracker.mel_bands}]")
+    return {
+        "file": os.path.basename(path),
+        "shape": list(matrix.shape),
+        "hop_ms": tracker.hop_ms,
+        "columns": columns,
+        **tracker.summary()
+    }
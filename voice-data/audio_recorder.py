@@ -2,10 +2,12 @@ import os
 import sys
 import json
 import time
+import argparse
 import sounddevice as sd
 import soundfile as sf
 import numpy as np
 import threading
+from bisect import bisect_left
 import colorama
 from colorama import Fore, Style, Back
 from rich.console import Console
@@ -14,6 +16,9 @@ from rich.table import Table
 from rich.prompt import Prompt
 from rich.progress import Progress
 from datetime import datetime
+from audio_features import FeatureTracker, save_features
+from vad import SilenceTrimmer, DEFAULT_THRESHOLD_DB, DEFAULT_PADDING_MS
+from audio_encoder import BackgroundEncoder, FORMATS, DEFAULT_FORMAT, output_path, output_rate
 
 # Initialize colorama
 colorama.init()
@@ -21,13 +26,150 @@ colorama.init()
 # Initialize Rich console
 console = Console()
 
-class AudioRecorder:
+# Constants
+RING_BUFFER_SECONDS = 10  # Audio the callback can get ahead of the disk writer before blocks are dropped
+WRITER_INTERVAL_MS = 50  # How often the writer thread drains the ring buffer to disk
+# Upper edges (microseconds) of the callback execution time histogram; the last bucket is open-ended
+CALLBACK_BUCKETS_US = [50, 100, 200, 500, 1000, 2000, 5000, 10000]
+
+class RingBuffer:
+    """Preallocated single-producer, single-consumer buffer of audio frames.
+
+    The audio callback copies each block in without allocating, and the
+    writer thread drains it to disk. Both positions only ever grow, and
+    each side only advances its own, so neither needs a lock. Memory use
+    is fixed by the capacity no matter how long a take runs.
+    """
+
+    def __init__(self, capacity, channels, dtype=np.float32):
+        self.data = np.zeros((capacity, channels), dtype=dtype)
+        self.capacity = capacity
+        self.write_pos = 0  # Frames pushed so far (advanced by the callback only)
+        self.read_pos = 0  # Frames drained so far (advanced by the writer only)
+        self.dropped = 0  # Frames discarded because the writer fell behind
+
+    def push(self, block):
+        """Copy a block in. Returns False (and drops it) if there is not enough free space."""
+        count = len(block)
+        if self.write_pos + count - self.read_pos > self.capacity:
+            self.dropped += count
+            return False
+        start = self.write_pos % self.capacity
+        first = min(count, self.capacity - start)
+        self.data[start:start + first] = block[:first]
+        self.data[:count - first] = block[first:]
+        self.write_pos += count
+        return True
+
+    def drain(self, write):
+        """Pass every buffered frame to `write`, in at most two contiguous slices."""
+        end = self.write_pos
+        while self.read_pos < end:
+            start = self.read_pos % self.capacity
+            stop = start + min(end - self.read_pos, self.capacity - start)
+            write(self.data[start:stop])
+            self.read_pos += stop - start
+
+class CaptureStats:
+    """Counters for one take, updated by the audio callback.
+
+    Only the callback writes these fields, using plain attribute and list
+    updates (no locks, no printing), so they can be read from other threads
+    while a take is running and are exact once the stream has stopped.
+    """
+
     def __init__(self):
+        self.callbacks = 0
+        self.frames_captured = 0
+        self.input_overflows = 0
+        self.input_underflows = 0
+        self.min_block = 0
+        self.max_block = 0
+        self.total_callback_us = 0.0
+        self.max_callback_us = 0.0
+        self.callback_histogram = [0] * (len(CALLBACK_BUCKETS_US) + 1)
+
+    def record_callback(self, frames, status, elapsed_us):
+        self.callbacks += 1
+        self.frames_captured += frames
+        if status:
+            if status.input_overflow:
+                self.input_overflows += 1
+            if status.input_underflow:
+                self.input_underflows += 1
+        if frames < self.min_block or not self.min_block:
+            self.min_block = frames
+        if frames > self.max_block:
+            self.max_block = frames
+        self.total_callback_us += elapsed_us
+        if elapsed_us > self.max_callback_us:
+            self.max_callback_us = elapsed_us
+        self.callback_histogram[bisect_left(CALLBACK_BUCKETS_US, elapsed_us)] += 1
+
+    def merge(self, other):
+        """Add another take's counters to these (for session totals)."""
+        self.callbacks += other.callbacks
+        self.frames_captured += other.frames_captured
+        self.input_overflows += other.input_overflows
+        self.input_underflows += other.input_underflows
+        if other.min_block and (other.min_block < self.min_block or not self.min_block):
+            self.min_block = other.min_block
+        self.max_block = max(self.max_block, other.max_block)
+        self.total_callback_us += other.total_callback_us
+        self.max_callback_us = max(self.max_callback_us, other.max_callback_us)
+        self.callback_histogram = [a + b for a, b in zip(self.callback_histogram, other.callback_histogram)]
+
+    def histogram(self):
+        """Bucket labels mapped to callback counts, e.g. {'<=50us': 3, ..., '>10000us': 0}."""
+        labels = [f"<={edge}us" for edge in CALLBACK_BUCKETS_US] + [f">{CALLBACK_BUCKETS_US[-1]}us"]
+        return dict(zip(labels, self.callback_histogram))
+
+    def to_dict(self, samplerate, frames_written, dropped_frames):
+        mean_us = self.total_callback_us / self.callbacks if self.callbacks else 0.0
+        return {
+            "frames_captured": self.frames_captured,
+            "frames_written": frames_written,
+            "dropped_frames": dropped_frames,
+            "input_overflows": self.input_overflows,
+            "input_underflows": self.input_underflows,
+            "callbacks": self.callbacks,
+            "block_frames": [self.min_block, self.max_block],
+            "block_ms": round(self.max_block * 1000 / samplerate, 3) if samplerate else 0.0,
+            "callback_mean_us": round(mean_us, 1),
+            "callback_max_us": round(self.max_callback_us, 1),
+            "callback_histogram": self.histogram()
+        }
+
+class AudioRecorder:
+    def __init__(self, mel_bands=0, trim=True, vad_threshold_db=DEFAULT_THRESHOLD_DB,
+                 trim_padding_ms=DEFAULT_PADDING_MS, audio_format=DEFAULT_FORMAT, target_rate=None):
         self.samplerate = 44100
+        self.mel_bands = mel_bands
+        self.trim = trim
+        self.vad_threshold_db = vad_threshold_db
+        self.trim_padding_ms = trim_padding_ms
+        self.features = None
+        self.trimmer = None
+        self.audio_format = audio_format
+        self.target_rate = target_rate
+        self.encoder = None
+        if audio_format != "wav" or target_rate:
+            self.encoder = BackgroundEncoder(audio_format, target_rate)
+        self.session_wav_bytes = 0
+        self.session_encoded_bytes = 0
         self.channels = 1
-        self.frames = []
+        self.buffer = None
+        self.frames_written = 0
+        self.stats = CaptureStats()
+        self.session_stats = CaptureStats()
+        self.session_takes = 0
+        self.session_frames_written = 0
+        self.session_dropped_frames = 0
         self.recording = False
         self.recording_thread = None
+        self.recording_error = None
+        self.timestamp = None
+        self.audio_path = None
         self.repo_path = os.path.join(os.getcwd(), "voice-data", "recordings")
         self.snippets = []
         self.current_snippet = None
@@ -94,11 +236,21 @@ class AudioRecorder:
                 console.print("[bold red]Please enter a number.[/bold red]")
 
     def start_recording(self):
-        """Start recording audio."""
-        self.frames = []
+        """Start recording audio, streaming it straight to a WAV file."""
+        self.timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.audio_path = os.path.join(self.repo_path, f"snippet_{self.timestamp}.wav")
+        self.buffer = RingBuffer(self.samplerate * RING_BUFFER_SECONDS, self.channels)
+        self.frames_written = 0
+        self.stats = CaptureStats()
+        self.features = FeatureTracker(self.samplerate, mel_bands=self.mel_bands)
+        self.trimmer = None
+        if self.trim:
+            self.trimmer = SilenceTrimmer(self.samplerate, self.channels, threshold_db=self.vad_threshold_db,
+                                          padding_ms=self.trim_padding_ms)
+        self.recording_error = None
         self.recording = True
         
-        # Create a new thread to record audio
+        # Create a new thread to record audio and write it to disk
         self.recording_thread = threading.Thread(target=self._record)
         self.recording_thread.start()
         
@@ -106,20 +258,62 @@ class AudioRecorder:
         console.print(f"\n{Back.RED}{Fore.WHITE} RECORDING {Style.RESET_ALL} Press Enter to stop...")
 
     def _record(self):
-        """Record audio in a separate thread."""
-        def callback(indata, frames, time, status):
-            if status:
-                console.print(f"[bold red]Status: {status}[/bold red]")
-            self.frames.append(indata.copy())
-            
-        with sd.InputStream(
-            samplerate=self.samplerate,
-            device=self.selected_device,
-            channels=self.channels,
-            callback=callback
-        ):
-            while self.recording:
-                sd.sleep(100)  # Small sleep to reduce CPU usage
+        """Record audio in a separate thread.
+
+        The stream callback only copies each block into the ring buffer;
+        this thread appends whatever has arrived to the open sound file
+        every few milliseconds, and once more after the stream stops.
+        With trimming on, blocks pass through the silence trimmer first,
+        so leading silence is never written, and the file is cut after the
+        last speech (plus padding) once the stream stops. Features are
+        computed from the same blocks as they are written.
+        Stream status flags are counted in the capture stats rather than
+        printed, since console output from the audio thread can itself
+        cause overflows.
+        """
+        buffer = self.buffer
+        stats = self.stats
+        features = self.features
+        trimmer = self.trimmer
+
+        def callback(indata, frames, time_info, status):
+            started = time.perf_counter()
+            buffer.push(indata)
+            stats.record_callback(frames, status, (time.perf_counter() - started) * 1e6)
+
+        def write(block):
+            if trimmer:
+                block = trimmer.process(block)
+                if not len(block):
+                    return
+            audio_file.write(block)
+            features.add(block)
+            self.frames_written += len(block)
+
+        try:
+            with sf.SoundFile(self.audio_path, mode='w', samplerate=self.samplerate,
+                              channels=self.channels) as audio_file:
+                with sd.InputStream(
+                    samplerate=self.samplerate,
+                    device=self.selected_device,
+                    channels=self.channels,
+                    dtype='float32',
+                    callback=callback
+                ):
+                    while self.recording:
+                        sd.sleep(WRITER_INTERVAL_MS)
+                        buffer.drain(write)
+                # The stream is closed, so no more blocks can arrive
+                buffer.drain(write)
+                if trimmer and trimmer.started:
+                    kept = trimmer.end_frame - trimmer.start_frame
+                    if kept < self.frames_written:
+                        audio_file.truncate(kept)
+                        features.truncate(kept)
+                        self.frames_written = kept
+        except Exception as e:
+            self.recording = False
+            self.recording_error = e
 
     def stop_recording(self):
         """Stop recording audio."""
@@ -127,53 +321,122 @@ class AudioRecorder:
         if self.recording_thread:
             self.recording_thread.join()
         console.print(f"\n[green]Recording stopped.[/green]")
+
+        if self.recording_error:
+            console.print(f"[bold red]Recording failed: {self.recording_error}[/bold red]")
+            return False
         
-        # Calculate duration
-        if self.frames:
-            duration = len(self.frames) * 100 / 1000  # 100ms per callback
-            console.print(f"[bold cyan]Recorded approximately {duration:.2f} seconds of audio[/bold cyan]")
+        self.session_takes += 1
+        self.session_stats.merge(self.stats)
+        self.session_frames_written += self.frames_written
+        self.session_dropped_frames += self.buffer.dropped
+
+        stats = self.stats
+        duration = self.frames_written / self.samplerate
+        console.print(f"[bold cyan]Recorded {duration:.2f} seconds of audio ({self.frames_written} frames)[/bold cyan]")
+        if self.trimmer:
+            if self.trimmer.started:
+                trim = self.trimmer.offsets()
+                console.print(f"[dim]Trimmed {trim['leading_trimmed_s']:.2f}s of leading and "
+                              f"{trim['trailing_trimmed_s']:.2f}s of trailing silence[/dim]")
+            elif stats.frames_captured:
+                console.print(f"[bold red]No speech detected above {self.vad_threshold_db} dBFS, so nothing was kept. "
+                              f"Lower --vad-threshold-db or use --no-trim.[/bold red]")
+        console.print(f"[dim]Callbacks: {stats.callbacks}, mean {stats.total_callback_us / max(stats.callbacks, 1):.0f}us, "
+                      f"max {stats.max_callback_us:.0f}us | Session: {self.session_takes} takes, "
+                      f"{self.session_stats.input_overflows} overflows, {self.session_dropped_frames} dropped frames[/dim]")
+        if stats.input_overflows or stats.input_underflows:
+            console.print(f"[bold red]Input overflows: {stats.input_overflows}, underflows: {stats.input_underflows} "
+                          f"(the audio device lost samples)[/bold red]")
+        if self.buffer.dropped:
+            console.print(f"[bold red]Dropped {self.buffer.dropped} frames: the disk writer fell behind[/bold red]")
         
         return True
 
+    def capture_stats(self):
+        """Stats for the last take, as stored in its metadata."""
+        return self.stats.to_dict(self.samplerate, self.frames_written, self.buffer.dropped if self.buffer else 0)
+
+    def print_session_summary(self):
+        """Print capture stats totalled over every take this session."""
+        if not self.session_takes:
+            return
+        totals = self.session_stats.to_dict(self.samplerate, self.session_frames_written, self.session_dropped_frames)
+        table = Table(title="Capture Summary", show_header=True, header_style="bold magenta")
+        table.add_column("Metric")
+        table.add_column("Value", justify="right")
+        table.add_row("Takes", str(self.session_takes))
+        for key in ["frames_captured", "frames_written", "dropped_frames", "input_overflows", "input_underflows",
+                    "callbacks", "callback_mean_us", "callback_max_us"]:
+            table.add_row(key, str(totals[key]))
+        table.add_row("block_frames (min-max)", f"{totals['block_frames'][0]}-{totals['block_frames'][1]}")
+        for bucket, count in totals["callback_histogram"].items():
+            table.add_row(f"callback {bucket}", str(count))
+        console.print(table)
+
+    def report_encoding(self):
+        """Print results from the background encoder that arrived since the last call."""
+        if not self.encoder:
+            return
+        finished, errors = self.encoder.take_results()
+        for path, original, encoded in finished:
+            self.session_wav_bytes += original
+            self.session_encoded_bytes += encoded
+        for wav_path, error in errors:
+            console.print(f"[bold red]Encoding {os.path.basename(wav_path)} failed, kept the WAV: {error}[/bold red]")
+
     def save_recording(self, text_snippet):
-        """Save the recorded audio and metadata."""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"snippet_{timestamp}"
-        audio_path = os.path.join(self.repo_path, f"{filename}.wav")
+        """Save the metadata for the recording, which is already on disk, and queue it for encoding."""
+        self.report_encoding()
+        if not self.audio_path:
+            console.print("[bold red]No audio data to save![/bold red]")
+            return None, None
+
+        audio_path = self.audio_path
+        self.audio_path = None
+        filename = os.path.splitext(os.path.basename(audio_path))[0]
         json_path = os.path.join(self.repo_path, f"{filename}.json")
+        features_path = os.path.join(self.repo_path, f"{filename}.features.npy")
         
-        if not self.frames:
+        if not self.frames_written:
             console.print("[bold red]No audio data to save![/bold red]")
+            if os.path.exists(audio_path):
+                os.remove(audio_path)
             return None, None
-            
-        # Combine all frames
-        audio_data = np.concatenate(self.frames, axis=0)
-        
-        # Save audio file
-        sf.write(audio_path, audio_data, self.samplerate)
-        
-        # Calculate audio features - simple averaging of amplitudes
-        # Take every 1000th sample (or fewer if less data) for a compact representation
-        step = max(1, len(audio_data) // 1000)
-        compact_feature = audio_data[::step].flatten().tolist()
         
+        # The metadata names the encoded file up front; the encoder points it back at the WAV if it fails
+        final_path, final_rate, final_format = audio_path, self.samplerate, "wav"
+        if self.encoder:
+            final_format = self.audio_format
+            final_path = output_path(audio_path, final_format)
+            final_rate = output_rate(final_format, self.samplerate, self.target_rate)
+
         # Save metadata
         metadata = {
             "text": text_snippet,
-            "timestamp": timestamp,
-            "duration": len(audio_data) / self.samplerate,
-            "sample_rate": self.samplerate,
-            "audio_file": f"{filename}.wav",
-            "audio_feature": compact_feature[:1000]  # Limit size for JSON
+            "timestamp": self.timestamp,
+            "duration": self.frames_written / self.samplerate,
+            "sample_rate": final_rate,
+            "capture_sample_rate": self.samplerate,
+            "audio_file": os.path.basename(final_path),
+            "audio_format": final_format,
+            "features": save_features(features_path, self.features),
+            "trim": self.trimmer.offsets() if self.trimmer else None,
+            "capture": self.capture_stats()
         }
         
         with open(json_path, 'w') as f:
             json.dump(metadata, f, indent=2)
-            
-        console.print(f"[green]Saved audio to:[/green] {audio_path}")
+
+        if self.encoder:
+            self.encoder.submit(audio_path, json_path)
+            console.print(f"[green]Saving audio to:[/green] {final_path} [dim](encoding in background)[/dim]")
+        else:
+            console.print(f"[green]Saved audio to:[/green] {audio_path}")
         console.print(f"[green]Saved metadata to:[/green] {json_path}")
+        console.print(f"[green]Saved features to:[/green] {features_path}")
         
-        return audio_path, json_path
+        return final_path, json_path
 
     def load_snippets(self, file_path=None):
         """Load text snippets from a file or use examples."""
@@ -218,9 +481,34 @@ class AudioRecorder:
     def cleanup(self):
         """Clean up resources."""
         colorama.deinit()
+        if self.encoder:
+            if self.encoder.pending():
+                console.print(f"\n[cyan]Finishing {self.encoder.pending()} background encoding(s)...[/cyan]")
+            self.encoder.close()
+            self.report_encoding()
+            if self.session_wav_bytes:
+                console.print(f"[cyan]Encoded audio: {self.session_encoded_bytes / 1e6:.1f} MB "
+                              f"({self.session_encoded_bytes / self.session_wav_bytes:.0%} of "
+                              f"{self.session_wav_bytes / 1e6:.1f} MB as WAV)[/cyan]")
+        self.print_session_summary()
         console.print("\n[bold green]Recording session completed. Thank you![/bold green]")
 
 def main():
+    parser = argparse.ArgumentParser(description="Record voice snippets by reading text shown on screen")
+    parser.add_argument("--mel-bands", type=int, default=0,
+                        help="Also store a log-mel spectrogram with this many bands in the features sidecar (default: off)")
+    parser.add_argument("--no-trim", action="store_true",
+                        help="Keep leading and trailing silence instead of trimming it")
+    parser.add_argument("--vad-threshold-db", type=float, default=DEFAULT_THRESHOLD_DB,
+                        help=f"RMS level (dBFS) that counts as speech when trimming (default: {DEFAULT_THRESHOLD_DB})")
+    parser.add_argument("--trim-padding-ms", type=int, default=DEFAULT_PADDING_MS,
+                        help=f"Silence kept before and after speech when trimming (default: {DEFAULT_PADDING_MS})")
+    parser.add_argument("--format", choices=sorted(FORMATS), default=DEFAULT_FORMAT,
+                        help=f"Format recordings are stored in (default: {DEFAULT_FORMAT}); opus is lossy")
+    parser.add_argument("--sample-rate", type=int,
+                        help="Resample recordings to this rate, e.g. 16000 or 24000 (default: keep the device rate)")
+    args = parser.parse_args()
+
     console.print(Panel(
         "[bold cyan]Voice Recording Interface[/bold cyan]\n\n"
         "This tool allows you to record audio snippets by reading displayed text.\n"
@@ -229,7 +517,9 @@ def main():
         border_style="yellow"
     ))
     
-    recorder = AudioRecorder()
+    recorder = AudioRecorder(mel_bands=args.mel_bands, trim=not args.no_trim,
+                             vad_threshold_db=args.vad_threshold_db, trim_padding_ms=args.trim_padding_ms,
+                             audio_format=args.format, target_rate=args.sample_rate)
     
     try:
         # Select audio device
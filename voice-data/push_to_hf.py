@@ -18,29 +18,29 @@ def create_metadata(recordings_dir):
     console.print("[bold cyan]Creating dataset metadata...[/bold cyan]")
     
     all_data = []
-    wav_files = glob.glob(os.path.join(recordings_dir, "*.wav"))
+    json_files = sorted(glob.glob(os.path.join(recordings_dir, "*.json")))
     
-    for wav_file in tqdm(wav_files):
-        base_name = os.path.splitext(os.path.basename(wav_file))[0]
-        json_file = os.path.join(recordings_dir, f"{base_name}.json")
-        
-        if not os.path.exists(json_file):
-            console.print(f"[yellow]Warning: No JSON file found for {base_name}.wav. Skipping.[/yellow]")
-            continue
-            
+    for json_file in tqdm(json_files):
         with open(json_file, 'r') as f:
             try:
                 metadata = json.load(f)
-                entry = {
-                    "text": metadata["text"],
-                    "audio": {"path": os.path.basename(wav_file)},
-                    "source": "recording",
-                    "timestamp": metadata["timestamp"]
-                }
-                all_data.append(entry)
             except json.JSONDecodeError:
                 console.print(f"[yellow]Warning: Invalid JSON in {json_file}. Skipping.[/yellow]")
                 continue
+
+        # Recordings may be WAV, FLAC or Opus; the metadata names the file
+        audio_name = metadata.get("audio_file") or f"{os.path.splitext(os.path.basename(json_file))[0]}.wav"
+        if not os.path.exists(os.path.join(recordings_dir, audio_name)):
+            console.print(f"[yellow]Warning: Audio file {audio_name} not found (still encoding?). Skipping.[/yellow]")
+            continue
+
+        entry = {
+            "text": metadata["text"],
+            "audio": {"path": audio_name},
+            "source": "recording",
+            "timestamp": metadata["timestamp"]
+        }
+        all_data.append(entry)
     
     return all_data
 
@@ -76,6 +76,8 @@ def push_to_huggingface(recordings_dir, repo_id, token=None, private=False):
     parquet_path = os.path.join(temp_dir, "data.parquet")
     df.to_parquet(parquet_path, index=False)
     
+    audio_formats = ", ".join(sorted({os.path.splitext(entry["audio"]["path"])[1][1:].upper() for entry in metadata}))
+
     # Create README with dataset card information
     readme_content = f"""---
 language: en
@@ -96,7 +98,7 @@ This dataset contains voice recordings created using the Audio Recorder tool.
 - **Created**: {datetime.now().strftime('%Y-%m-%d')}
 - **Number of samples**: {len(metadata)}
 - **Languages**: English
-- **Format**: WAV audio files with text transcriptions
+- **Format**: {audio_formats} audio files with text transcriptions
 
 ## Dataset Structure
 
@@ -150,12 +152,11 @@ dataset = load_dataset("{repo_id}")
             repo_type="dataset"
         )
         
-        # Upload all WAV files
-        audio_files = glob.glob(os.path.join(recordings_dir, "*.wav"))
-        for audio_file in tqdm(audio_files, desc="Uploading audio files"):
-            audio_filename = os.path.basename(audio_file)
+        # Upload the audio file of every recording in the metadata
+        audio_files = [entry["audio"]["path"] for entry in metadata]
+        for audio_filename in tqdm(audio_files, desc="Uploading audio files"):
             api.upload_file(
-                path_or_fileobj=audio_file,
+                path_or_fileobj=os.path.join(recordings_dir, audio_filename),
                 path_in_repo=audio_filename,
                 repo_id=repo_id,
                 repo_type="dataset"
@@ -20,7 +20,7 @@ fi
 
 # Run the audio recorder
 echo "Starting Audio Recorder..."
-uv run audio_recorder.py
+uv run audio_recorder.py "$@"
 
 # Exit with the exit code of the Python script
 exit $? 
\ No newline at end of file
@@ -0,0 +1,112 @@
+import numpy as np
+
+# Constants
+FRAME_MS = 10  # Energy is measured over 10 ms frames
+DEFAULT_THRESHOLD_DB = -45.0  # Frames at or above this RMS level (dBFS) count as voiced
+DEFAULT_PADDING_MS = 250  # Audio kept before the first and after the last voiced frame
+DEFAULT_MIN_SPEECH_MS = 50  # Voiced frames needed in a row before they count as speech, to ignore clicks
+
+class SilenceTrimmer:
+    """Energy-based voice activity detection that trims silence while recording.
+
+    Blocks go through `process`, which returns the audio that should be
+    written now. Until speech starts, only the last `padding_ms` (plus the
+    frames still being judged) are held back, so leading silence never
+    reaches the file. Once speech has started everything is passed through,
+    and the position where the last speech run ended is tracked; after the
+    take, `end_frame` says where to cut the file to drop trailing silence.
+
+    Speech is a run of at least `min_speech_ms` of frames whose RMS level
+    is at or above `threshold_db`. Each batch of frames is judged in one
+    vectorized step, with the run length carried over between blocks.
+    Frame positions are counted in captured frames from the start of the take.
+    """
+
+    def __init__(self, samplerate, channels, threshold_db=DEFAULT_THRESHOLD_DB,
+                 padding_ms=DEFAULT_PADDING_MS, min_speech_ms=DEFAULT_MIN_SPEECH_MS):
+        self.samplerate = samplerate
+        self.threshold_db = threshold_db
+        self.padding_ms = padding_ms
+        self.hop = max(1, round(samplerate * FRAME_MS / 1000))
+        self.padding = round(samplerate * padding_ms / 1000)
+        self.min_frames = max(1, -(-min_speech_ms // FRAME_MS))
+        self.threshold = (10.0 ** (threshold_db / 20.0)) ** 2  # Compared with mean square, not RMS
+        # Samples held back before speech starts: the padding plus the longest run still being judged
+        self.keep = self.padding + (self.min_frames + 1) * self.hop
+        self.held = np.zeros((0, channels), dtype=np.float32)
+        self.held_start = 0  # Captured frame position of held[0]
+        self.pending = np.zeros(0, dtype=np.float32)  # Mono samples not yet making up a whole frame
+        self.frames_judged = 0  # Whole frames measured so far
+        self.run = 0  # Voiced frames in a row at the end of the last batch
+        self.captured = 0
+        self.start_frame = None  # First captured frame written to the file, once speech is found
+        self.speech_end = None  # Captured frame position just after the last speech run
+
+    @property
+    def started(self):
+        return self.start_frame is not None
+
+    def process(self, block):
+        """Judge a (frames, channels) block and return the audio to write now (possibly empty)."""
+        already_started = self.started
+        self.captured += len(block)
+        self._judge(block.mean(axis=1) if block.ndim > 1 else block)
+        if already_started:
+            return block
+
+        self.held = np.concatenate([self.held, block])
+        if self.started:
+            # Speech was found in this block: release it along with the padding before it
+            offset = self.start_frame - self.held_start
+            out = self.held[offset:]
+            self.held = self.held[:0]
+            return out
+        if len(self.held) > self.keep:
+            drop = len(self.held) - self.keep
+            self.held = self.held[drop:].copy()
+            self.held_start += drop
+        return self.held[:0]
+
+    def _judge(self, mono):
+        samples = np.concatenate([self.pending, mono.astype(np.float32, copy=False)])
+        count = len(samples) // self.hop
+        self.pending = samples[count * self.hop:].copy()
+        if count == 0:
+            return
+        frames = samples[:count * self.hop].reshape(count, self.hop)
+        voiced = np.einsum('ij,ij->i', frames, frames) / self.hop >= self.threshold
+
+        # Length of the voiced run ending at each frame, continuing the run from the last batch
+        position = np.arange(1, count + 1)
+        last_unvoiced = np.maximum.accumulate(np.where(voiced, 0, position))
+        runs = position - last_unvoiced + np.where(last_unvoiced == 0, self.run, 0)
+        self.run = int(runs[-1])
+
+        speech = np.flatnonzero(runs >= self.min_frames)
+        if len(speech):
+            first = self.frames_judged + int(speech[0]) - int(runs[speech[0]]) + 1
+            if not self.started:
+                self.start_frame = max(self.held_start, first * self.hop - self.padding)
+            self.speech_end = (self.frames_judged + int(speech[-1]) + 1) * self.hop
+        self.frames_judged += count
+
+    @property
+    def end_frame(self):
+        """Captured frame position to cut the take at (trailing padding included), or None if no speech."""
+        if self.speech_end is None:
+            return None
+        return min(self.captured, self.speech_end + self.padding)
+
+    def offsets(self):
+        """Trim offsets for the metadata, in captured frames and seconds."""
+        start = self.start_frame or 0
+        end = self.end_frame if self.end_frame is not None else start
+        return {
+            "captured_frames": self.captured,
+            "start_frame": start,
+            "end_frame": end,
+            "leading_trimmed_s": round(start / self.samplerate, 3),
+            "trailing_trimmed_s": round((self.captured - end) / self.samplerate, 3),
+            "threshold_db": self.threshold_db,
+            "padding_ms": self.padding_ms
+        }